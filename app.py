@@ -4,6 +4,7 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from config import Config
 from models import db, User
+import click
 import os
 
 def create_app(config_class=Config):
@@ -23,6 +24,19 @@ def create_app(config_class=Config):
     jwt = JWTManager(app)
     migrate = Migrate(app, db)
     
+    # Response middleware
+    from middleware import compression, profiling, metrics, db_timeouts, replica, rate_limit
+    compression.init_app(app)
+    profiling.init_app(app)
+    metrics.init_app(app)
+    db_timeouts.init_app(app)
+    replica.init_app(app)
+    rate_limit.init_app(app)
+    
+    # Monitoring event broker
+    from services import events
+    events.init_app(app)
+    
     # JWT error handlers
     @jwt.unauthorized_loader
     def unauthorized_callback(callback):
@@ -46,7 +60,9 @@ def create_app(config_class=Config):
     
     # Create upload directories
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-    os.makedirs(app.config['RECORDING_FOLDER'], exist_ok=True)
+    from services import storage, ngram_detector
+    storage.init_app(app)
+    ngram_detector.init_app(app)
     
     # Register blueprints
     from routes.auth import auth_bp
@@ -59,10 +75,78 @@ def create_app(config_class=Config):
     app.register_blueprint(exam_bp, url_prefix='/api/exam')
     app.register_blueprint(proctoring_bp, url_prefix='/api/proctoring')
     
-    # Create tables and admin user
-    with app.app_context():
-        db.create_all()
-        create_admin_user(app)
+    # Schema and admin bootstrap run once per deploy via `flask init-db`, not
+    # on every worker boot
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables and the default admin user"""
+        bootstrap(app)
+    
+    @app.cli.command('purge-archived-exams')
+    def purge_archived_exams_command():
+        """Finish purging exams that were archived but not yet removed"""
+        from services.exam_purge import purge_archived_exams
+        exam_ids = purge_archived_exams()
+        print(f"Purged {len(exam_ids)} archived exam(s)")
+    
+    @app.cli.command('gc-media')
+    @click.option('--dry-run', is_flag=True, help='Report what would be removed without deleting')
+    def gc_media_command(dry_run):
+        """Remove orphaned, expired and over-quota recordings and screenshots"""
+        import json
+        from services.media_gc import collect_media
+        print(json.dumps(collect_media(dry_run=dry_run), indent=2))
+    
+    @app.cli.command('process-recordings')
+    @click.option('--session-id', type=int, help='Only process this session')
+    @click.option('--force', is_flag=True, help='Rebuild renditions that already exist')
+    def process_recordings_command(session_id, force):
+        """Build review renditions and contact sheets for uploaded recordings"""
+        from services.media_pipeline import process_pending_recordings
+        done, failed = process_pending_recordings(app, session_id=session_id, force=force)
+        print(f"Processed {done} recording(s), {failed} failed")
+    
+    @app.cli.command('rebuild-analytics')
+    @click.option('--exam-id', type=int, help='Only rebuild this exam')
+    def rebuild_analytics_command(exam_id):
+        """Recompute exam analytics summary tables from stored sessions"""
+        from models import Exam
+        from services.analytics import rebuild_exam_analytics
+        exam_ids = [exam_id] if exam_id else list(db.session.scalars(db.select(Exam.id)))
+        for eid in exam_ids:
+            rebuild_exam_analytics(eid)
+            db.session.commit()
+        print(f"Rebuilt analytics for {len(exam_ids)} exam(s)")
+    
+    @app.cli.command('train-ngram-model')
+    @click.option('--input', 'input_path', type=click.Path(exists=True),
+                  help='Train on this file (JSONL with a "text" field, or one answer per line) instead of the DB')
+    @click.option('--output', help='Model path (defaults to NGRAM_MODEL_PATH)')
+    def train_ngram_model_command(input_path, output):
+        """Train the offline n-gram detector on human-written answers"""
+        import json
+        from services.ngram_detector import human_answer_texts, read_texts, train
+        texts = read_texts(input_path) if input_path else human_answer_texts()
+        header = train(texts, output or app.config['NGRAM_MODEL_PATH'])
+        print(json.dumps({key: header[key] for key in ('trained_answers', 'holdout_answers', 'calibration')},
+                         indent=2))
+    
+    @app.cli.command('rebuild-fingerprints')
+    @click.option('--batch-size', type=int, default=1000, help='Answers read per batch')
+    def rebuild_fingerprints_command(batch_size):
+        """Rebuild the answer fingerprint corpus from the answers table"""
+        import json
+        from services.fingerprints import rebuild_fingerprints
+        print(json.dumps(rebuild_fingerprints(batch_size=batch_size), indent=2))
+    
+    @app.cli.command('compact-fingerprints')
+    def compact_fingerprints_command():
+        """Merge fingerprint corpus segments into one"""
+        import json
+        from services.fingerprints import get_fingerprint_store
+        store = get_fingerprint_store()
+        store.compact()
+        print(json.dumps(store.stats(), indent=2))
     
     @app.route('/')
     def index():
@@ -79,12 +163,18 @@ def create_app(config_class=Config):
     
     @app.route('/recordings/<path:filename>')
     def serve_recording(filename):
-        """Serve video recordings"""
-        from flask import send_from_directory
-        return send_from_directory(app.config['RECORDING_FOLDER'], filename)
+        """Serve video recordings (redirects to a presigned URL on S3)"""
+        from services.storage import get_storage
+        return get_storage().send(filename)
     
     return app
 
+def bootstrap(app):
+    """Create tables and the default admin user"""
+    with app.app_context():
+        db.create_all()
+        create_admin_user(app)
+
 def create_admin_user(app):
     """Create default admin user if not exists"""
     admin = User.query.filter_by(email=app.config['ADMIN_EMAIL']).first()
@@ -103,4 +193,6 @@ def create_admin_user(app):
 app = create_app()
 
 if __name__ == '__main__':
+    bootstrap(app)
+    app.config['SSE_ENABLED'] = True  # the development server is threaded
     app.run(debug=True, host='0.0.0.0', port=5000)
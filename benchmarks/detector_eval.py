@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+"""
+Accuracy and throughput evaluation for the AI detection engines.
+
+Runs each engine (and the fused ensemble, as detect_ai_content does) over a
+labelled JSONL dataset, one answer per line:
+
+    {"id": "h01", "label": "human" | "ai" | "plagiarized", "text": "...", "groq": "<raw Groq reply>"}
+
+AI-generated and plagiarized answers are the positives. Groq is replaced by
+a stub replaying each answer's recorded reply, so runs are offline and
+repeatable; `--record` fills in the replies from the real API (re-record
+after changing the prompt). Reports coverage, precision, recall, F1,
+ROC-AUC, Brier score, expected calibration error, the flag rate per label
+and answers/s per engine, and fails when a metric regresses against the
+saved baseline.
+
+    python benchmarks/detector_eval.py --save-baseline
+    python benchmarks/detector_eval.py --engines pattern ensemble --show-errors
+    python benchmarks/detector_eval.py --ngram-model ngram_model.bin
+    GROQ_API_KEY=... python benchmarks/detector_eval.py --dataset answers.jsonl --record answers_recorded.jsonl
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_DATASET = os.path.join(ROOT, 'benchmarks', 'data', 'detector_sample.jsonl')
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'detector_baseline.json')
+LABELS = ('human', 'ai', 'plagiarized')
+POSITIVE_LABELS = ('ai', 'plagiarized')
+CALIBRATION_BINS = 10
+
+# Metrics where a higher value is better; the rest are errors
+HIGHER_IS_BETTER = ('precision', 'recall', 'f1', 'roc_auc')
+LOWER_IS_BETTER = ('brier', 'ece')
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()[:12]
+
+
+def answer_key(messages):
+    """The answer text inside the Groq user message (which truncates it)"""
+    return messages[-1]['content'].split('\n\n', 1)[-1]
+
+
+class RecordedGroq:
+    """Stand-in for groq.Groq that replays the recorded reply for each answer"""
+
+    def __init__(self, records, latency=0.0):
+        self.replies = {r['text'][:1500]: (r['groq'], r.get('groq_prompt')) for r in records if r.get('groq')}
+        self.latency = latency
+        self.stale = set()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        key = answer_key(messages)
+        if key not in self.replies:
+            raise LookupError('no recorded Groq reply for this answer')
+        reply, recorded_prompt = self.replies[key]
+        if recorded_prompt and recorded_prompt != prompt_hash(messages[0]['content']):
+            self.stale.add(key)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+class RecordingGroq:
+    """Wraps the real client and keeps every raw reply"""
+
+    def __init__(self, client):
+        self.client = client
+        self.replies = {}
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        response = self.client.chat.completions.create(messages=messages, **kwargs)
+        self.replies[answer_key(messages)] = (response.choices[0].message.content,
+                                              prompt_hash(messages[0]['content']))
+        return response
+
+
+def load_dataset(path):
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    for record in records:
+        if record.get('label') not in LABELS:
+            raise ValueError(f"{record.get('id')}: label must be one of {', '.join(LABELS)}")
+    return records
+
+
+def roc_auc(positives, scores):
+    """Probability a positive outranks a negative (Mann-Whitney U, ties count half)"""
+    order = sorted(range(len(scores)), key=lambda i: scores[i])
+    ranks = [0.0] * len(scores)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and scores[order[j + 1]] == scores[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    n_pos = sum(positives)
+    n_neg = len(positives) - n_pos
+    if not n_pos or not n_neg:
+        return None
+    rank_sum = sum(rank for rank, positive in zip(ranks, positives) if positive)
+    return (rank_sum - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def calibration(positives, scores):
+    """Brier score and expected calibration error over equal-width confidence bins"""
+    brier = sum((score - positive) ** 2 for score, positive in zip(scores, positives)) / len(scores)
+    bins = [[] for _ in range(CALIBRATION_BINS)]
+    for score, positive in zip(scores, positives):
+        bins[min(int(score * CALIBRATION_BINS), CALIBRATION_BINS - 1)].append((score, positive))
+    ece = sum(
+        len(b) / len(scores) * abs(sum(s for s, _ in b) / len(b) - sum(p for _, p in b) / len(b))
+        for b in bins if b
+    )
+    return brier, ece
+
+
+def evaluate(detect, records, min_seconds):
+    """Run one engine over the dataset, then time further passes for at least min_seconds"""
+    # Engines log parse errors and fallbacks with print(); keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [detect(record['text']) for record in records]
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_seconds:
+            for record in records:
+                detect(record['text'])
+            calls += len(records)
+        elapsed = time.perf_counter() - start
+
+    answered = [(record, result) for record, result in zip(records, results) if result is not None]
+    metrics = {'answers': len(records), 'coverage': round(len(answered) / len(records), 3)}
+    if not answered:
+        return metrics, []
+    metrics['answers_per_sec'] = round(calls / elapsed) if calls else None
+
+    positives = [record['label'] in POSITIVE_LABELS for record, _ in answered]
+    flagged = [bool(result['is_ai_generated']) for _, result in answered]
+    scores = [min(max(float(result['confidence']), 0.0), 1.0) for _, result in answered]
+    true_pos = sum(p and f for p, f in zip(positives, flagged))
+    precision = true_pos / sum(flagged) if any(flagged) else None
+    recall = true_pos / sum(positives) if any(positives) else None
+    brier, ece = calibration(positives, scores)
+    metrics.update({
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision and recall else None,
+        'roc_auc': roc_auc(positives, scores),
+        'brier': brier,
+        'ece': ece
+    })
+    for label in LABELS:
+        flags = [f for (record, _), f in zip(answered, flagged) if record['label'] == label]
+        metrics[f'flagged_{label}'] = sum(flags) / len(flags) if flags else None
+    metrics = {key: round(value, 3) if isinstance(value, float) else value for key, value in metrics.items()}
+
+    errors = [(record['id'], record['label'], result['confidence'])
+              for (record, result), positive, flag in zip(answered, positives, flagged) if positive != flag]
+    return metrics, errors
+
+
+def compare(results, baseline, tolerance, speed_tolerance):
+    """Return a list of regressions beyond the tolerances"""
+    regressions = []
+    for engine, base in baseline.items():
+        current = results.get(engine)
+        if not current:
+            continue
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if base.get(metric) is None:
+                continue
+            if current.get(metric) is None:
+                regressions.append(f"{engine}: {metric} missing (baseline {base[metric]})")
+                continue
+            delta = current[metric] - base[metric]
+            if (delta < -tolerance) if metric in HIGHER_IS_BETTER else (delta > tolerance):
+                regressions.append(f"{engine}: {metric} {current[metric]} vs baseline {base[metric]}")
+        if current['coverage'] < base['coverage'] - tolerance:
+            regressions.append(f"{engine}: coverage {current['coverage']} vs baseline {base['coverage']}")
+        if (base.get('answers_per_sec') and current.get('answers_per_sec')
+                and current['answers_per_sec'] < base['answers_per_sec'] * (1 - speed_tolerance)):
+            regressions.append(f"{engine}: {current['answers_per_sec']} answers/s "
+                               f"vs baseline {base['answers_per_sec']}")
+    return regressions
+
+
+def print_table(results, baseline=None):
+    columns = [('coverage', 'cover'), ('precision', 'prec'), ('recall', 'recall'), ('f1', 'f1'),
+               ('roc_auc', 'auc'), ('brier', 'brier'), ('ece', 'ece'), ('flagged_human', 'fp_hum'),
+               ('flagged_ai', 'tp_ai'), ('flagged_plagiarized', 'tp_plag'), ('answers_per_sec', 'ans/s')]
+    print(f"{'engine':<10}" + ''.join(f'{title:>10}' for _, title in columns))
+
+    def cell(value):
+        return f'{value:>10}' if value is not None else f"{'-':>10}"
+
+    for engine, metrics in results.items():
+        print(f'{engine:<10}' + ''.join(cell(metrics.get(key)) for key, _ in columns))
+        base = (baseline or {}).get(engine)
+        if base:
+            deltas = [round(metrics[key] - base[key], 3)
+                      if metrics.get(key) is not None and base.get(key) is not None else None
+                      for key, _ in columns]
+            print(f"{'  vs base':<10}" + ''.join(f'{d:>+10}' if d is not None else cell(None) for d in deltas))
+
+
+def record_replies(records, output):
+    """Call the real Groq API for every answer and write the dataset with its replies"""
+    from services import ai_detector
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key or api_key == 'your-groq-api-key-here':
+        print("Set GROQ_API_KEY to record Groq replies")
+        return 1
+    recorder = RecordingGroq(ai_detector.get_groq_client(api_key))
+    ai_detector.get_groq_client = lambda key: recorder
+    missing = 0
+    with open(output, 'w', encoding='utf-8') as f:
+        for record in records:
+            ai_detector.groq_detection(record['text'])
+            reply = recorder.replies.get(record['text'][:1500])
+            if reply is None:
+                missing += 1
+            else:
+                record = dict(record, groq=reply[0], groq_prompt=reply[1])
+            f.write(json.dumps(record) + '\n')
+    print(f"Recorded {len(records) - missing}/{len(records)} Groq replies to {output}")
+    return 1 if missing else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dataset', default=DEFAULT_DATASET)
+    parser.add_argument('--engines', nargs='+', help='Registered engines and/or "ensemble" (default: all)')
+    parser.add_argument('--ngram-model', help='Load this n-gram model for the ngram engine')
+    parser.add_argument('--groq-latency-ms', type=float, default=0.0, help='Delay added to each replayed reply')
+    parser.add_argument('--min-seconds', type=float, default=1.0,
+                        help='Time each engine for at least this long to measure answers/s (0 to skip)')
+    parser.add_argument('--record', metavar='OUTPUT', help='Record real Groq replies into OUTPUT and exit')
+    parser.add_argument('--show-errors', action='store_true', help='List misclassified answers per engine')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.02, help='Allowed absolute drop in accuracy metrics')
+    parser.add_argument('--speed-tolerance', type=float, default=0.25,
+                        help='Allowed answers/s slowdown (0.25 = 25%%)')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    records = load_dataset(args.dataset)
+    if args.record:
+        return record_replies(records, args.record)
+
+    from services import ai_detector, ngram_detector
+    if args.ngram_model:
+        ngram_detector.load_model(args.ngram_model)
+    groq = RecordedGroq(records, args.groq_latency_ms / 1000)
+    ai_detector.get_groq_client = lambda key: groq
+    os.environ['GROQ_API_KEY'] = 'recorded'
+
+    engines = args.engines or [*ai_detector.AI_DETECTORS, 'ensemble']
+    detectors = {'ensemble': ai_detector.detect_ai_content, **ai_detector._detectors}
+    unknown = [engine for engine in engines if engine not in detectors]
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(unknown)} (choose from {', '.join(detectors)})")
+
+    counts = {label: sum(r['label'] == label for r in records) for label in LABELS}
+    print(f"{len(records)} answers: " + ', '.join(f'{n} {label}' for label, n in counts.items()) + '\n')
+    results = {}
+    for engine in engines:
+        results[engine], errors = evaluate(detectors[engine], records, args.min_seconds)
+        if args.show_errors and errors:
+            print(f"{engine} misclassified: " + ', '.join(f'{i} ({label}, {conf})' for i, label, conf in errors))
+    if args.show_errors:
+        print()
+    if groq.stale:
+        print(f"Warning: {len(groq.stale)} Groq replies were recorded with a different prompt; "
+              f"re-record them with --record\n")
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_table(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance, args.speed_tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
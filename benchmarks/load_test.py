@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+"""
+Load test for the candidate exam flow.
+
+Boots create_app against SQLite (or any DATABASE_URL) with a mocked Groq
+client, seeds exams and candidates, then drives concurrent exam flows:
+start, autosaves, answers, violations, heartbeats, stats updates and submit.
+Reports p50/p95/p99 latency, requests/sec and SQL queries per request for
+each endpoint, and fails when results regress against a stored baseline.
+
+    python benchmarks/load_test.py --candidates 200 --concurrency 16
+    python benchmarks/load_test.py --save-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+SAMPLE_ANSWER = (
+    "I think the main reason is that caching keeps hot data close to where it is used. "
+    "In my last project we didn't cache the session lookups and the database got hammered. "
+    "Furthermore, it is important to note that invalidation is the hard part of the design."
+)
+
+
+class FakeGroq:
+    """Stand-in for groq.Groq that answers with a fixed verdict after a delay"""
+
+    latency = 0.0
+
+    def __init__(self, api_key=None, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        content = json.dumps({'is_ai_generated': False, 'confidence': 0.2,
+                              'reasoning': 'benchmark stub', 'type': 'human_original'})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects latency and SQL statement counts per endpoint"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def count_query(self, *args, **kwargs):
+        self._local.queries = getattr(self._local, 'queries', 0) + 1
+
+    def call(self, name, fn, *args, **kwargs):
+        self._local.queries = 0
+        start = time.perf_counter()
+        response = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.samples[name].append(elapsed)
+            self.queries[name] += self._local.queries
+            if response.status_code >= 400:
+                self.errors[name] += 1
+        return response
+
+    def report(self, wall_time):
+        results = {}
+        for name, values in sorted(self.samples.items()):
+            values = sorted(values)
+            results[name] = {
+                'requests': len(values),
+                'errors': self.errors[name],
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p95_ms': round(percentile(values, 95) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'rps': round(len(values) / wall_time, 1),
+                'queries_per_request': round(self.queries[name] / len(values), 2)
+            }
+        return results
+
+
+def build_app(database_url, groq_latency):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['GROQ_API_KEY'] = 'benchmark'
+    sys.path.insert(0, ROOT)
+
+    import services.ai_detector as ai_detector
+    FakeGroq.latency = groq_latency
+    ai_detector.get_groq_client = lambda api_key: FakeGroq(api_key=api_key)
+
+    from app import create_app, bootstrap
+    from config import Config, engine_options
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = ({'connect_args': {'timeout': 30}} if database_url.startswith('sqlite')
+                                     else engine_options(database_url))
+
+    app = create_app(BenchmarkConfig)
+    bootstrap(app)
+    return app
+
+
+def seed(app, exams, candidates, questions):
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from models import db, Exam, Question, User
+
+    with app.app_context():
+        exam_ids = []
+        for i in range(exams):
+            exam = Exam(title=f'Benchmark exam {i}', duration_minutes=60)
+            db.session.add(exam)
+            db.session.flush()
+            exam_ids.append(exam.id)
+            rows = []
+            for q in range(questions):
+                if q % 2 == 0:
+                    rows.append({'exam_id': exam.id, 'question_type': 'mcq', 'question_text': f'Q{q}',
+                                 'options': ['a', 'b', 'c', 'd'], 'correct_answer': 'B', 'order': q})
+                else:
+                    rows.append({'exam_id': exam.id, 'question_type': 'open_ended',
+                                 'question_text': f'Q{q}', 'order': q})
+            db.session.execute(insert(Question), rows)
+
+        run_id = int(time.time())
+        users = [{'email': f'bench{run_id}_{i}@example.com', 'full_name': f'Candidate {i}',
+                  'is_admin': False, 'assigned_exam_id': exam_ids[i % len(exam_ids)]}
+                 for i in range(candidates)]
+        db.session.execute(insert(User), users)
+        db.session.commit()
+
+        rows = db.session.execute(
+            db.select(User.id, User.assigned_exam_id).where(User.email.like(f'bench{run_id}_%'))
+        ).all()
+        flows = [(create_access_token(identity=str(uid), additional_claims={'is_admin': False}), exam_id)
+                 for uid, exam_id in rows]
+
+        question_map = {}
+        for exam_id in exam_ids:
+            question_map[exam_id] = [(q.id, q.question_type) for q in
+                                     Question.query.filter_by(exam_id=exam_id).order_by(Question.order)]
+    return flows, question_map
+
+
+def run_flow(app, recorder, token, exam_id, questions, autosaves, violations, heartbeats):
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = recorder.call('exam.available', client.get, '/api/exam/available', headers=headers)
+    response = recorder.call('exam.start', client.post, f'/api/exam/{exam_id}/start', headers=headers)
+    if response.status_code != 201:
+        return
+    session_id = response.get_json()['session_id']
+
+    for i, (question_id, question_type) in enumerate(questions):
+        if question_type == 'mcq':
+            recorder.call('exam.answer', client.post, f'/api/exam/session/{session_id}/answer',
+                          headers=headers, json={'question_id': question_id, 'selected_option': 'B'})
+            continue
+        text = ''
+        for revision in range(1, autosaves + 1):
+            chunk = SAMPLE_ANSWER[(revision - 1) * 20:revision * 20]
+            body = {'question_id': question_id, 'revision': revision,
+                    'typing': {'keystrokes': len(chunk), 'active_ms': 4000}}
+            if revision == 1:
+                body['text'] = chunk
+            else:
+                body['base_revision'] = revision - 1
+                body['diff'] = {'start': len(text), 'delete': 0, 'insert': chunk}
+            text += chunk
+            recorder.call('exam.autosave', client.post, f'/api/exam/session/{session_id}/autosave',
+                          headers=headers, json=body)
+        recorder.call('exam.answer', client.post, f'/api/exam/session/{session_id}/answer',
+                      headers=headers, json={'question_id': question_id, 'answer_text': SAMPLE_ANSWER,
+                                             'revision': autosaves})
+
+        if i < violations:
+            recorder.call('proctoring.violation', client.post, '/api/proctoring/violation', headers=headers,
+                          json={'session_id': session_id, 'violation_type': 'tab_switch'})
+        for _ in range(heartbeats):
+            recorder.call('proctoring.heartbeat', client.post, '/api/proctoring/heartbeat',
+                          headers=headers, json={'session_id': session_id})
+
+    recorder.call('proctoring.update_stats', client.post, '/api/proctoring/update-stats', headers=headers,
+                  json={'session_id': session_id, 'tab_switches': violations})
+    recorder.call('exam.submit', client.post, f'/api/exam/session/{session_id}/submit', headers=headers)
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions: p95 slower than tolerance, or more queries"""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not current:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance) and current['p95_ms'] - base['p95_ms'] > 1:
+            regressions.append(f"{name}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if current['queries_per_request'] > base['queries_per_request'] + 0.01:
+            regressions.append(f"{name}: {current['queries_per_request']} queries/request "
+                               f"vs baseline {base['queries_per_request']}")
+    return regressions
+
+
+def print_table(results, wall_time):
+    print(f"{'endpoint':<26}{'reqs':>7}{'err':>5}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'rps':>9}{'q/req':>8}")
+    for name, r in results.items():
+        print(f"{name:<26}{r['requests']:>7}{r['errors']:>5}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+              f"{r['p99_ms']:>9}{r['rps']:>9}{r['queries_per_request']:>8}")
+    total = sum(r['requests'] for r in results.values())
+    print(f"\n{total} requests in {wall_time:.2f}s ({total / wall_time:.1f} req/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Defaults to a fresh SQLite file')
+    parser.add_argument('--exams', type=int, default=2)
+    parser.add_argument('--candidates', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=6)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--autosaves', type=int, default=5, help='Autosaves per open-ended answer')
+    parser.add_argument('--violations', type=int, default=2)
+    parser.add_argument('--heartbeats', type=int, default=1, help='Heartbeats per question')
+    parser.add_argument('--groq-latency-ms', type=float, default=0.0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 slowdown (0.25 = 25%%)')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    # Output paths are relative to where the benchmark was started, not the scratch dir
+    args.baseline = os.path.abspath(args.baseline)
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.chdir(tempfile.mkdtemp())  # keep uploads/recordings out of the repo
+    app = build_app(database_url, args.groq_latency_ms / 1000)
+
+    from sqlalchemy import event
+    from models import db
+
+    flows, question_map = seed(app, args.exams, args.candidates, args.questions)
+
+    recorder = Recorder()
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', recorder.count_query)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_flow, app, recorder, token, exam_id, question_map[exam_id],
+                               args.autosaves, args.violations, args.heartbeats)
+                   for token, exam_id in flows]
+        for future in futures:
+            future.result()
+    wall_time = time.perf_counter() - start
+
+    results = recorder.report(wall_time)
+    print_table(results, wall_time)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Response serialization benchmark for the large admin endpoints.
+
+Seeds sessions with answers and violations, then times GET /api/admin/sessions
+and GET /api/admin/sessions/<id> against the previous implementation (ORM
+objects, hand-built dicts, jsonify), which is kept here as the reference.
+The current implementation is also timed with orjson disabled, to separate the
+encoder from the query and row-building changes. Reports response bytes per
+second for each and checks that they decode to the same JSON.
+
+    python benchmarks/serialization.py --sessions 2000 --answers 40 --violations 200
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from load_test import build_app  # noqa: E402
+
+
+def legacy_all_sessions():
+    from flask import jsonify
+    from models import ExamSession
+    sessions = ExamSession.query.order_by(ExamSession.id).all()
+    return jsonify([{
+        'id': session.id,
+        'exam_title': session.exam.title,
+        'candidate_name': session.candidate.full_name,
+        'candidate_email': session.candidate.email,
+        'started_at': session.started_at.isoformat(),
+        'submitted_at': session.submitted_at.isoformat() if session.submitted_at else None,
+        'status': session.status,
+        'total_score': session.total_score,
+        'percentage': session.percentage,
+        'tab_switches': session.tab_switches,
+        'copy_attempts': session.copy_attempts,
+        'paste_attempts': session.paste_attempts,
+        'suspicious_activity_count': session.suspicious_activity_count
+    } for session in sessions]), 200
+
+
+def legacy_session_details(session_id):
+    from flask import jsonify
+    from sqlalchemy import select
+    from models import db, AnswerDraft, ExamSession
+    session = ExamSession.query.get_or_404(session_id)
+    typing_stats = dict(db.session.execute(
+        select(AnswerDraft.question_id, AnswerDraft.typing_stats).where(AnswerDraft.session_id == session_id)
+    ).all())
+    answers = [{
+        'question_id': answer.question_id,
+        'question_text': answer.question.question_text,
+        'question_type': answer.question.question_type,
+        'answer_text': answer.answer_text,
+        'selected_option': answer.selected_option,
+        'correct_answer': answer.question.correct_answer if answer.question.question_type == 'mcq' else None,
+        'is_ai_generated': answer.is_ai_generated,
+        'ai_confidence': answer.ai_confidence,
+        'ai_analysis': answer.ai_analysis,
+        'ai_engines': answer.ai_engines,
+        'score': answer.score,
+        'points': answer.question.points,
+        'typing_stats': typing_stats.get(answer.question_id)
+    } for answer in sorted(session.answers, key=lambda a: a.id)]
+    violations = [{
+        'id': v.id,
+        'violation_type': v.violation_type,
+        'description': v.description,
+        'timestamp': v.timestamp.isoformat(),
+        'severity': v.severity
+    } for v in sorted(session.violations, key=lambda v: v.id)]
+    return jsonify({
+        'id': session.id,
+        'exam_title': session.exam.title,
+        'candidate_name': session.candidate.full_name,
+        'candidate_email': session.candidate.email,
+        'started_at': session.started_at.isoformat(),
+        'submitted_at': session.submitted_at.isoformat() if session.submitted_at else None,
+        'status': session.status,
+        'total_score': session.total_score,
+        'percentage': session.percentage,
+        'video_recording_path': session.video_recording_path,
+        'media_renditions': session.media_renditions,
+        'proctoring_stats': {
+            'tab_switches': session.tab_switches,
+            'copy_attempts': session.copy_attempts,
+            'paste_attempts': session.paste_attempts,
+            'suspicious_activity_count': session.suspicious_activity_count
+        },
+        'answers': answers,
+        'violations': violations
+    }), 200
+
+
+def seed(app, sessions, answers, violations):
+    """Bulk-insert one exam, `sessions` completed sessions and a detailed session; returns its id"""
+    from datetime import datetime, timedelta
+    from sqlalchemy import insert, select
+    from models import db, Answer, AnswerDraft, Exam, ExamSession, ProctoringViolation, Question, User
+
+    now = datetime.utcnow().replace(microsecond=123456)
+    with app.app_context():
+        exam = Exam(title='Serialization benchmark', duration_minutes=60)
+        db.session.add(exam)
+        db.session.flush()
+        db.session.execute(insert(Question), [
+            {'exam_id': exam.id, 'question_type': 'mcq' if q % 2 else 'open_ended', 'question_text': f'Question {q}',
+             'options': ['a', 'b', 'c', 'd'] if q % 2 else None, 'correct_answer': 'B' if q % 2 else None,
+             'points': 1.0, 'order': q}
+            for q in range(answers)
+        ])
+        question_ids = db.session.scalars(select(Question.id).where(Question.exam_id == exam.id)).all()
+        db.session.execute(insert(User), [
+            {'email': f'serial{i}@example.com', 'full_name': f'Candidate {i}', 'is_admin': False}
+            for i in range(sessions)
+        ])
+        user_ids = db.session.scalars(select(User.id).where(User.email.like('serial%'))).all()
+        db.session.execute(insert(ExamSession), [
+            {'exam_id': exam.id, 'candidate_id': uid, 'started_at': now - timedelta(hours=1), 'submitted_at': now,
+             'status': 'completed', 'total_score': 7.0, 'percentage': 70.0, 'tab_switches': i % 5,
+             'copy_attempts': i % 3, 'paste_attempts': i % 2, 'suspicious_activity_count': i % 4}
+            for i, uid in enumerate(user_ids)
+        ])
+        session_id = db.session.scalar(select(ExamSession.id).order_by(ExamSession.id.desc()).limit(1))
+        text = 'A considered answer about caching, indexing and transactions. ' * 8
+        db.session.execute(insert(Answer), [
+            {'session_id': session_id, 'question_id': qid, 'answer_text': text, 'selected_option': 'B',
+             'is_ai_generated': False, 'ai_confidence': 0.25, 'ai_analysis': 'Pattern analysis: human', 'score': 1.0}
+            for qid in question_ids
+        ])
+        db.session.execute(insert(AnswerDraft), [
+            {'session_id': session_id, 'question_id': qid, 'revision': 12, 'draft_text': text,
+             'typing_stats': {'keystrokes': 480, 'deletions': 36, 'active_ms': 91000}}
+            for qid in question_ids[::2]
+        ])
+        db.session.execute(insert(ProctoringViolation), [
+            {'session_id': session_id, 'violation_type': 'tab_switch', 'description': 'Switched tabs',
+             'timestamp': now - timedelta(seconds=i), 'severity': 'medium'}
+            for i in range(violations)
+        ])
+        db.session.commit()
+    return session_id
+
+
+def measure(client, url, headers, iterations):
+    client.get(url, headers=headers)  # warm caches
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.status_code
+        total_bytes += len(response.data)
+    elapsed = time.perf_counter() - start
+    return {'ms_per_request': round(elapsed / iterations * 1000, 2),
+            'bytes': total_bytes // iterations,
+            'mb_per_sec': round(total_bytes / elapsed / 1e6, 2)}, response.data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Defaults to a fresh SQLite file')
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--answers', type=int, default=40, help='Answers in the detailed session')
+    parser.add_argument('--violations', type=int, default=200, help='Violations in the detailed session')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    if args.json:
+        args.json = os.path.abspath(args.json)  # before changing into the scratch dir
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.chdir(tempfile.mkdtemp())
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    app = build_app(database_url, 0)
+
+    from flask_jwt_extended import create_access_token
+    from routes import admin
+    from services import serializers
+
+    # The benchmark calls the views without admin auth, so both sides do the same work
+    app.add_url_rule('/bench/legacy/sessions', 'legacy_all_sessions', legacy_all_sessions)
+    app.add_url_rule('/bench/legacy/sessions/<int:session_id>', 'legacy_session_details', legacy_session_details)
+    app.add_url_rule('/bench/sessions', 'bench_all_sessions', admin.get_all_sessions.__wrapped__)
+    app.add_url_rule('/bench/sessions/<int:session_id>', 'bench_session_details',
+                     admin.get_session_details.__wrapped__)
+
+    session_id = seed(app, args.sessions, args.answers, args.violations)
+    with app.app_context():
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+    client = app.test_client()
+
+    results = {}
+    for name, path in (('get_all_sessions', '/sessions'), ('get_session_details', f'/sessions/{session_id}')):
+        legacy, legacy_body = measure(client, '/bench/legacy' + path, headers, args.iterations)
+        current, current_body = measure(client, '/bench' + path, headers, args.iterations)
+        encoder, serializers.orjson = serializers.orjson, None
+        try:
+            stdlib, _ = measure(client, '/bench' + path, headers, args.iterations)
+        finally:
+            serializers.orjson = encoder
+        results[name] = {'legacy': legacy, 'stdlib_json': stdlib, 'current': current,
+                         'speedup': round(current['mb_per_sec'] / legacy['mb_per_sec'], 2),
+                         'same_json': json.loads(legacy_body) == json.loads(current_body)}
+
+    print(f"{'endpoint':<22}{'impl':>12}{'ms/req':>10}{'bytes':>11}{'MB/s':>9}")
+    for name, r in results.items():
+        for impl in ('legacy', 'stdlib_json', 'current'):
+            m = r[impl]
+            print(f"{name:<22}{impl:>12}{m['ms_per_request']:>10}{m['bytes']:>11}{m['mb_per_sec']:>9}")
+        print(f"{'':<22}{'speedup':>12}{r['speedup']:>10}x  same JSON: {r['same_json']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r['same_json'] for r in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Worker boot benchmark.
+
+Imports `app` (which builds the Flask app, as a gunicorn worker does) in fresh
+interpreters and reports boot time, DB connections opened during boot and
+whether heavy optional SDKs were imported eagerly. Exits non-zero if boot
+touches the database or loads a lazily-imported dependency.
+
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported when a request needs them
+LAZY_MODULES = ['groq', 'numpy', 'cv2']
+
+PROBE = '''
+import json, sys, time
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+connections = []
+event.listen(Pool, 'connect', lambda *args: connections.append(1))
+
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+
+print(json.dumps({
+    'seconds': elapsed,
+    'connections': len(connections),
+    'lazy_loaded': [m for m in %r if m in sys.modules]
+}))
+''' % (LAZY_MODULES,)
+
+
+def run_once(env):
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--database-url', help='Defaults to a SQLite file that is never created')
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    env['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'startup.db')
+
+    samples = [run_once(env) for _ in range(args.runs)]
+    times = sorted(s['seconds'] * 1000 for s in samples)
+
+    print(f"boot time over {args.runs} runs: median {statistics.median(times):.1f}ms, "
+          f"min {times[0]:.1f}ms, max {times[-1]:.1f}ms")
+    connections = max(s['connections'] for s in samples)
+    lazy_loaded = sorted({m for s in samples for m in s['lazy_loaded']})
+    print(f"DB connections during boot: {connections}")
+    print(f"Eagerly imported heavy modules: {', '.join(lazy_loaded) or 'none'}")
+
+    if connections or lazy_loaded:
+        print("FAIL: worker boot should not touch the database or import heavy SDKs")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+Concurrent-candidate capacity per core for each gunicorn worker class.
+
+Starts a stub Groq endpoint that answers after --groq-latency-ms, seeds
+candidates, then runs one gunicorn worker (one core) per mode and ramps the
+number of candidates submitting open-ended answers at once. For each level it
+reports answers/sec and p95 latency; a mode's capacity is the highest level
+whose p95 stays under --slo-ms with no errors.
+
+    python benchmarks/worker_modes.py --modes sync gthread gevent --levels 1 4 16 64
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from load_test import SAMPLE_ANSWER, build_app, percentile, seed  # noqa: E402
+
+JWT_SECRET = 'worker-modes-benchmark-jwt-secret-key'
+
+
+def start_groq_stub(latency):
+    """OpenAI-compatible chat completions endpoint that replies after `latency` seconds"""
+    verdict = json.dumps({'is_ai_generated': False, 'confidence': 0.2,
+                          'reasoning': 'benchmark stub', 'type': 'human_original'})
+    body = json.dumps({
+        'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': 'stub',
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': verdict}}],
+        'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+    }).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(mode, threads, env):
+    port = free_port()
+    env = dict(env, GUNICORN_WORKER_CLASS=mode, GUNICORN_THREADS=str(threads))
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '-w', '1', '-k', mode, '--threads', str(threads), '-b', f'127.0.0.1:{port}',
+         '--pythonpath', ROOT, '--timeout', '120', '--log-level', 'warning', 'app:app'],
+        env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/')
+            conn.getresponse().read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"gunicorn ({mode}) exited with {process.returncode}")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"gunicorn ({mode}) did not start")
+
+
+def post(port, path, token, body):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request('POST', path, json.dumps(body),
+                     {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def candidate(port, token, exam_id, questions, answers):
+    """Start a session and submit `answers` open-ended answers; returns (latencies, errors)"""
+    status, body = post(port, f'/api/exam/{exam_id}/start', token, {})
+    if status != 201:
+        return [], answers
+    session_id = json.loads(body)['session_id']
+    latencies, errors = [], 0
+    for i in range(answers):
+        started = time.perf_counter()
+        status, _ = post(port, f'/api/exam/session/{session_id}/answer', token,
+                         {'question_id': questions[i % len(questions)], 'answer_text': SAMPLE_ANSWER})
+        latencies.append(time.perf_counter() - started)
+        errors += status >= 400
+    return latencies, errors
+
+
+def run_level(port, flows, question_map, level, answers):
+    batch, flows[:] = flows[:level], flows[level:]
+    if len(batch) < level:
+        raise RuntimeError('Not enough seeded candidates; raise --candidates')
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        results = list(pool.map(lambda flow: candidate(port, flow[0], flow[1], question_map[flow[1]], answers),
+                                batch))
+    wall_time = time.perf_counter() - started
+    latencies = sorted(value for values, _ in results for value in values)
+    return {
+        'candidates': level,
+        'answers': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'answers_per_sec': round(len(latencies) / wall_time, 1),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 1)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Defaults to a fresh SQLite file')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gthread worker')
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 4, 16, 64],
+                        help='Concurrent candidates to try')
+    parser.add_argument('--answers', type=int, default=3, help='Answers submitted per candidate')
+    parser.add_argument('--groq-latency-ms', type=float, default=500.0)
+    parser.add_argument('--groq-concurrency', type=int, default=64,
+                        help='GROQ_MAX_CONCURRENCY per worker, high enough not to be the bottleneck')
+    parser.add_argument('--slo-ms', type=float, default=2000.0, help='p95 answer latency target')
+    parser.add_argument('--json', help='Write results to this file')
+    args = parser.parse_args(argv)
+
+    if args.json:
+        args.json = os.path.abspath(args.json)  # before changing into the scratch dir
+    database_url = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ['JWT_SECRET_KEY'] = JWT_SECRET
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)  # keep uploads/recordings out of the repo
+
+    app = build_app(database_url, 0)
+    per_mode = sum(args.levels)
+    flows, question_map = seed(app, 1, per_mode * len(args.modes), 2)
+    open_ended = {exam_id: [qid for qid, kind in questions if kind == 'open_ended']
+                  for exam_id, questions in question_map.items()}
+
+    groq = start_groq_stub(args.groq_latency_ms / 1000)
+    env = dict(os.environ, DATABASE_URL=database_url, JWT_SECRET_KEY=JWT_SECRET, GROQ_API_KEY='benchmark',
+               GROQ_MAX_CONCURRENCY=str(args.groq_concurrency),
+               GROQ_BASE_URL=f'http://127.0.0.1:{groq.server_port}', RATE_LIMIT_ENABLED='false',
+               MEDIA_PROCESS_WORKERS='0', PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'))
+
+    results = {}
+    for mode in args.modes:
+        process, port = start_gunicorn(mode, args.threads if mode == 'gthread' else 1, env)
+        try:
+            results[mode] = [run_level(port, flows, open_ended, level, args.answers) for level in args.levels]
+        finally:
+            process.terminate()
+            process.wait()
+    groq.shutdown()
+
+    print(f"Groq latency {args.groq_latency_ms:.0f}ms, SLO p95 < {args.slo_ms:.0f}ms, one worker (one core) per mode\n")
+    print(f"{'mode':<10}{'candidates':>12}{'answers':>9}{'err':>5}{'ans/s':>9}{'p95ms':>10}")
+    for mode, levels in results.items():
+        for r in levels:
+            print(f"{mode:<10}{r['candidates']:>12}{r['answers']:>9}{r['errors']:>5}"
+                  f"{r['answers_per_sec']:>9}{r['p95_ms']:>10}")
+    print(f"\n{'mode':<10}{'candidates/core within SLO':>28}")
+    for mode, levels in results.items():
+        within = [r['candidates'] for r in levels if r['p95_ms'] <= args.slo_ms and not r['errors']]
+        print(f"{mode:<10}{max(within, default=0):>28}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
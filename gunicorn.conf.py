@@ -0,0 +1,40 @@
+"""Gunicorn settings picked up automatically from the working directory"""
+import os
+import shutil
+import tempfile
+
+# Worker model; config.py sizes the DB pool from the same variables
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+# Concurrent greenlets per gevent/eventlet worker
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '200'))
+
+# Shared directory where each worker writes its Prometheus samples
+prometheus_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'exam-proctoring-metrics')
+)
+
+
+def on_starting(server):
+    # Start every deploy with empty metric files
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Let psycopg2 yield to other greenlets while it waits on PostgreSQL
+    if worker_class in ('gevent', 'eventlet'):
+        try:
+            if worker_class == 'eventlet':
+                from psycogreen.eventlet import patch_psycopg
+            else:
+                from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen not installed; PostgreSQL queries will block the %s worker",
+                               worker_class)
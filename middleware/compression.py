@@ -0,0 +1,111 @@
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'text/html', 'text/css', 'text/plain',
+    'text/javascript', 'application/javascript', 'image/svg+xml', 'text/csv'
+}
+
+# Compressed static bodies keyed by (etag, encoding) so pages like admin.html
+# are only compressed once per deploy.
+_static_cache = OrderedDict()
+_static_cache_lock = threading.Lock()
+STATIC_CACHE_SIZE = 64
+
+
+def init_app(app):
+    """Add ETag/304 handling and gzip/brotli compression to GET responses"""
+    app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_MAX_SIZE', 5 * 1024 * 1024)
+
+    @app.after_request
+    def compress_response(response):
+        return _process(app, response)
+
+
+def _choose_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _process(app, response):
+    if request.method not in ('GET', 'HEAD') or response.status_code != 200:
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    is_static = response.direct_passthrough
+    if is_static:
+        # send_file responses: only buffer reasonably small assets
+        if not response.content_length or response.content_length > app.config['COMPRESS_MAX_SIZE']:
+            return response
+        response.direct_passthrough = False
+    elif response.is_streamed:
+        return response
+
+    data = response.get_data()
+
+    # Strong validator for the identity body; encoded variants get a suffix
+    etag = hashlib.sha1(data).hexdigest()
+    encoding = None
+    if len(data) >= app.config['COMPRESS_MIN_SIZE']:
+        encoding = _choose_encoding()
+    variant_etag = f'{etag}-{encoding}' if encoding else etag
+
+    response.headers.add('Vary', 'Accept-Encoding')
+    if not is_static:
+        response.headers.setdefault('Cache-Control', 'private, no-cache')
+
+    if request.if_none_match.contains(variant_etag) or request.if_none_match.contains(etag):
+        response.set_etag(variant_etag)
+        response.status_code = 304
+        response.set_data(b'')
+        response.headers.pop('Content-Length', None)
+        return response
+
+    response.set_etag(variant_etag)
+
+    if encoding:
+        if is_static:
+            body = _cached_static_body(etag, encoding, data, app.config['COMPRESS_LEVEL'])
+        else:
+            body = _compress(data, encoding, app.config['COMPRESS_LEVEL'])
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+
+    return response
+
+
+def _cached_static_body(etag, encoding, data, level):
+    key = (etag, encoding)
+    with _static_cache_lock:
+        body = _static_cache.get(key)
+        if body is not None:
+            _static_cache.move_to_end(key)
+            return body
+
+    body = _compress(data, encoding, level)
+    with _static_cache_lock:
+        _static_cache[key] = body
+        while len(_static_cache) > STATIC_CACHE_SIZE:
+            _static_cache.popitem(last=False)
+    return body
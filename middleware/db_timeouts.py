@@ -0,0 +1,57 @@
+"""
+Per-request statement timeouts and admin concurrency limits.
+
+Every PostgreSQL transaction started while serving a request gets
+`SET LOCAL statement_timeout` when the request's blueprint has an override
+(DB_STATEMENT_TIMEOUTS) or when the deployment uses PgBouncer, which cannot
+carry the default through connection startup options.
+"""
+import threading
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+# Long-lived endpoints that do not hold a DB connection while open
+SLOT_EXEMPT_ENDPOINTS = {'admin.monitoring_stream'}
+
+
+def init_app(app):
+    app.config.setdefault('DB_STATEMENT_TIMEOUT_MS', 10000)
+    app.config.setdefault('DB_STATEMENT_TIMEOUTS', {})
+    app.config.setdefault('DB_ADMIN_MAX_CONCURRENT', 0)
+
+    admin_slots = None
+    if app.config['DB_ADMIN_MAX_CONCURRENT'] > 0:
+        admin_slots = threading.BoundedSemaphore(app.config['DB_ADMIN_MAX_CONCURRENT'])
+
+    @app.before_request
+    def choose_statement_timeout():
+        g._statement_timeout = app.config['DB_STATEMENT_TIMEOUTS'].get(request.blueprint)
+
+        if (admin_slots is not None and request.blueprint == 'admin'
+                and request.endpoint not in SLOT_EXEMPT_ENDPOINTS):
+            if not admin_slots.acquire(timeout=5):
+                return jsonify({'error': 'Too many concurrent admin requests, please retry'}), 503
+            g._admin_slot = True
+
+    @app.teardown_request
+    def release_admin_slot(exc):
+        if g.pop('_admin_slot', False):
+            admin_slots.release()
+
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        return
+
+    pgbouncer = 'options' not in app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('connect_args', {})
+
+    def set_statement_timeout(conn):
+        timeout = g.get('_statement_timeout') if has_request_context() else None
+        if timeout is None and pgbouncer:
+            timeout = app.config['DB_STATEMENT_TIMEOUT_MS']
+        if timeout is not None:
+            conn.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+    with app.app_context():
+        from models import db
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'begin', set_statement_timeout)
@@ -0,0 +1,125 @@
+"""
+Prometheus metrics for the exam pipeline, exposed at /metrics.
+
+Under gunicorn set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does this) so
+every worker writes its samples to shared files and /metrics aggregates them.
+Without METRICS_TOKEN, /metrics only answers direct requests from loopback or
+private addresses.
+"""
+import ipaddress
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event, func, select
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+DETECTION_LATENCY = Histogram(
+    'ai_detection_duration_seconds', 'AI detection latency by engine', ['engine'],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+)
+GROQ_REQUESTS = Counter('groq_requests_total', 'Groq detection calls by outcome', ['outcome'])
+DETECTOR_RESULTS = Counter(
+    'ai_detector_results_total', 'AI detection engine results by status', ['engine', 'status']
+)
+VIOLATIONS = Counter('proctoring_violations_total', 'Recorded proctoring violations', ['violation_type'])
+# Violation types are client-supplied; anything else is labelled 'other' so
+# candidates cannot create unbounded series
+VIOLATION_LABELS = frozenset({
+    'tab_switch', 'window_blur', 'workspace_switch', 'fullscreen_exit', 'shortcut',
+    'copy', 'cut', 'paste', 'no_face', 'multiple_faces'
+})
+RATE_LIMITED = Counter('rate_limited_requests_total', 'Requests rejected by rate limits', ['endpoint', 'scope'])
+RECORDING_BYTES = Counter('recording_bytes_written_total', 'Bytes of recordings and screenshots written', ['kind'])
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_connections_checked_out', 'DB connections currently checked out',
+    multiprocess_mode='livesum'
+)
+
+
+def violation_label(violation_type):
+    return violation_type if violation_type in VIOLATION_LABELS else 'other'
+
+
+def _is_internal_request():
+    """Direct from loopback or a private network, not relayed by a proxy"""
+    if request.headers.get('X-Forwarded-For'):
+        return False
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return address.is_loopback or address.is_private
+
+
+class SessionCollector:
+    """Reads exam session counts by status from the database at scrape time"""
+
+    def collect(self):
+        from models import db, ExamSession
+        gauge = GaugeMetricFamily('exam_sessions', 'Exam sessions by status', labels=['status'])
+        try:
+            rows = db.session.execute(
+                select(ExamSession.status, func.count()).group_by(ExamSession.status)
+            ).all()
+        except Exception as e:
+            print(f"Error collecting session metrics: {str(e)}")
+            rows = []
+        for status, count in rows:
+            gauge.add_metric([status or 'unknown'], count)
+        yield gauge
+
+
+def init_app(app):
+    app.config.setdefault('METRICS_TOKEN', None)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None and request.endpoint != 'metrics':
+            REQUEST_LATENCY.labels(
+                blueprint=request.blueprint or 'app',
+                endpoint=request.endpoint or 'unknown',
+                method=request.method,
+                status=response.status_code
+            ).observe(time.perf_counter() - start)
+        return response
+
+    with app.app_context():
+        from models import db
+        engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'checkout', lambda *args: DB_POOL_CHECKED_OUT.inc())
+        event.listen(engine, 'checkin', lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+    session_collector = SessionCollector()
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return Response('Unauthorized', status=401)
+        if not token and not _is_internal_request():
+            return Response('Set METRICS_TOKEN to scrape metrics from outside the private network', status=403)
+
+        registry = CollectorRegistry()
+        multiprocess_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+        if multiprocess_dir:
+            from prometheus_client import multiprocess
+            multiprocess.MultiProcessCollector(registry)
+        registry.register(session_collector)
+
+        data = generate_latest(registry)
+        if not multiprocess_dir:
+            data = generate_latest(REGISTRY) + data
+        return Response(data, mimetype=CONTENT_TYPE_LATEST)
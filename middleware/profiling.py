@@ -0,0 +1,185 @@
+"""
+Opt-in per-request profiling.
+
+With PROFILING_ENABLED every request records wall time, SQL statement count
+and SQL time (via SQLAlchemy cursor events) and time spent in external calls
+such as Groq. The numbers are sent as a Server-Timing header and logged as one
+JSON line per request.
+
+Sampled cProfile (or pyinstrument, if installed) runs are controlled by the
+JSON file at PROFILING_CONFIG_PATH, re-read when it changes, so endpoints can
+be profiled on a running deployment:
+
+    {"endpoints": {"admin.get_session_details": 0.1, "exam.submit_answer": 1.0}}
+
+Each sampled request writes a .prof (or .html) file into PROFILING_OUTPUT_DIR.
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('request_timing')
+
+_sample_rates = {}
+_config_state = {'mtime': None, 'checked_at': 0.0}
+_config_lock = threading.Lock()
+CONFIG_CHECK_SECONDS = 5
+
+
+def init_app(app):
+    app.config.setdefault('PROFILING_ENABLED', False)
+    app.config.setdefault('PROFILING_CONFIG_PATH', 'profiling.json')
+    app.config.setdefault('PROFILING_OUTPUT_DIR', 'profiles')
+
+    if not app.config['PROFILING_ENABLED']:
+        return
+
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_timing():
+        g._timing = {'start': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0, 'external': {}}
+        rate = _sample_rate(app, request.endpoint)
+        if rate and random.random() < rate:
+            g._profiler = _start_profiler()
+
+    @app.after_request
+    def emit_timing(response):
+        timing = g.pop('_timing', None)
+        if timing is None:
+            return response
+        total = time.perf_counter() - timing['start']
+
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            _save_profile(app, profiler, request.endpoint)
+
+        metrics = [f'sql;dur={timing["sql_time"] * 1000:.1f};desc="{timing["sql_count"]} queries"']
+        for name, (count, seconds) in timing['external'].items():
+            metrics.append(f'{name};dur={seconds * 1000:.1f};desc="{count} calls"')
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        response.headers.add('Server-Timing', ', '.join(metrics))
+
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'sql_count': timing['sql_count'],
+            'sql_ms': round(timing['sql_time'] * 1000, 2),
+            'external_ms': {k: round(v[1] * 1000, 2) for k, v in timing['external'].items()},
+            'profiled': profiler is not None
+        }))
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # Requests that raised never reach after_request
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+
+
+def request_timing():
+    """The current request's timing dict, or None; take it before handing work to another thread"""
+    return g.get('_timing') if has_request_context() else None
+
+
+def record_external(timing, name, seconds, calls=1):
+    """Add outbound call time to a timing dict from request_timing()"""
+    if timing is not None:
+        count, total = timing['external'].get(name, (0, 0.0))
+        timing['external'][name] = (count + calls, total + seconds)
+
+
+@contextmanager
+def track_external(name):
+    """Time an outbound call made on the request's thread against the request"""
+    timing = request_timing()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_external(timing, name, time.perf_counter() - start)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and '_timing' in g:
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('_query_start')
+    if not starts or not has_request_context():
+        return
+    timing = g.get('_timing')
+    elapsed = time.perf_counter() - starts.pop()
+    if timing is not None:
+        timing['sql_count'] += 1
+        timing['sql_time'] += elapsed
+
+
+def _sample_rate(app, endpoint):
+    now = time.monotonic()
+    if now - _config_state['checked_at'] >= CONFIG_CHECK_SECONDS:
+        with _config_lock:
+            _config_state['checked_at'] = now
+            path = app.config['PROFILING_CONFIG_PATH']
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = None
+            if mtime != _config_state['mtime']:
+                _config_state['mtime'] = mtime
+                _sample_rates.clear()
+                if mtime is not None:
+                    try:
+                        with open(path) as f:
+                            _sample_rates.update(json.load(f).get('endpoints', {}))
+                    except (OSError, ValueError) as e:
+                        print(f"Error reading profiling config: {str(e)}")
+    return _sample_rates.get(endpoint) or _sample_rates.get('*')
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = Profiler()
+        profiler.start()
+    return profiler
+
+
+def _save_profile(app, profiler, endpoint):
+    output_dir = app.config['PROFILING_OUTPUT_DIR']
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f'{endpoint or "unknown"}_{int(time.time() * 1000)}')
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        profiler.dump_stats(base + '.prof')
+    else:
+        profiler.stop()
+        with open(base + '.html', 'w') as f:
+            f.write(profiler.output_html())
@@ -0,0 +1,170 @@
+"""
+Token-bucket rate limits for candidate write endpoints.
+
+DEFAULT_RATE_LIMITS (adjusted by RATE_LIMIT_OVERRIDES) maps an endpoint to buckets keyed by 'identity' (JWT subject,
+client address when there is none) and/or 'session' (session_id from the URL
+or JSON body, scoped to the identity so nobody can drain another candidate's
+bucket). Each bucket is (requests per minute, burst). The check runs
+in before_request and only verifies the JWT signature, so a limited request
+gets its 429 without touching the database.
+
+Buckets live in process memory by default. With several gunicorn workers or
+hosts, set RATE_LIMIT_STORAGE_URL=redis://... so all workers share them. If
+Redis is unreachable the worker falls back to its own buckets.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import jsonify, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from middleware.metrics import RATE_LIMITED
+
+DEFAULT_RATE_LIMITS = {
+    'proctoring.report_violation': {'identity': (120, 40), 'session': (60, 20)},
+    'proctoring.update_stats': {'identity': (120, 40), 'session': (60, 20)},
+    'proctoring.heartbeat': {'identity': (24, 12), 'session': (12, 6)},
+    'proctoring.upload_recording': {'identity': (10, 5)},
+    'exam.submit_answer': {'identity': (240, 120), 'session': (120, 60)},
+    'exam.autosave_answer': {'identity': (240, 80), 'session': (120, 40)},
+    'exam.upload_typing_events': {'identity': (120, 40), 'session': (60, 20)}
+}
+
+# KEYS[1] bucket; ARGV: tokens per second, burst, now. Returns {allowed, tokens}.
+REDIS_TOKEN_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def take_token(tokens, updated, now, rate, burst):
+    """Refill a bucket and try to take one token: returns (allowed, tokens left)"""
+    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+    if tokens >= 1:
+        return True, tokens - 1
+    return False, tokens
+
+
+class MemoryStore:
+    """Buckets for this worker process, least recently used evicted first"""
+
+    def __init__(self, max_keys=100000):
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def take(self, key, rate, burst, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            allowed, tokens = take_token(tokens, updated, now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+
+class RedisStore:
+    """Buckets shared by every worker through Redis (redis-py imported on first use)"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        self.url = url
+        self.prefix = prefix
+        self.fallback = MemoryStore()
+        self._script = None
+        self._lock = threading.Lock()
+
+    def _get_script(self):
+        if self._script is None:
+            with self._lock:
+                if self._script is None:
+                    import redis
+                    client = redis.Redis.from_url(self.url, socket_timeout=0.05, socket_connect_timeout=0.05)
+                    self._script = client.register_script(REDIS_TOKEN_BUCKET)
+        return self._script
+
+    def take(self, key, rate, burst, now):
+        try:
+            allowed, tokens = self._get_script()(keys=[self.prefix + key], args=[rate, burst, now])
+            return bool(allowed), float(tokens)
+        except Exception as e:
+            print(f"Rate limit store unavailable, using local buckets: {str(e)}")
+            return self.fallback.take(key, rate, burst, now)
+
+
+def compile_limits(limits):
+    """{endpoint: {scope: (per_minute, burst)}} -> {endpoint: [(scope, per_second, burst)]}"""
+    compiled = {}
+    for endpoint, scopes in limits.items():
+        rules = []
+        for scope, (per_minute, burst) in scopes.items():
+            if scope not in ('identity', 'session'):
+                raise ValueError(f"Unknown rate limit scope {scope!r} for {endpoint}")
+            rules.append((scope, per_minute / 60.0, max(1, int(burst))))
+        compiled[endpoint] = rules
+    return compiled
+
+
+def init_app(app):
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_STORAGE_URL', None)
+    app.config.setdefault('RATE_LIMIT_OVERRIDES', {})
+
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+
+    # Overrides replace an endpoint's buckets; null removes its limit
+    configured = {**DEFAULT_RATE_LIMITS, **app.config['RATE_LIMIT_OVERRIDES']}
+    limits = compile_limits({endpoint: scopes for endpoint, scopes in configured.items() if scopes})
+    storage_url = app.config['RATE_LIMIT_STORAGE_URL']
+    store = RedisStore(storage_url) if storage_url else MemoryStore()
+
+    @app.before_request
+    def check_rate_limit():
+        rules = limits.get(request.endpoint)
+        if not rules:
+            return
+        now = time.time()
+        identity = _identity_key()
+        for scope, rate, burst in rules:
+            subject = identity
+            if scope == 'session':
+                session_id = _session_id()
+                if session_id is None:
+                    continue
+                subject = f'{identity}:session:{session_id}'
+            allowed, tokens = store.take(f'{request.endpoint}:{scope}:{subject}', rate, burst, now)
+            if not allowed:
+                RATE_LIMITED.labels(endpoint=request.endpoint, scope=scope).inc()
+                response = jsonify({'error': 'Too many requests, please slow down'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil((1 - tokens) / rate)))
+                return response
+
+
+def _identity_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None  # the view's own @jwt_required produces the error response
+    return f'user:{identity}' if identity else f'ip:{request.remote_addr}'
+
+
+def _session_id():
+    session_id = (request.view_args or {}).get('session_id')
+    if session_id is None and request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            session_id = body.get('session_id')
+    return session_id
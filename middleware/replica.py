@@ -0,0 +1,83 @@
+"""
+Read-replica routing for admin analytics.
+
+When REPLICA_DATABASE_URL is set it is registered as the 'replica' bind, and
+read-only (GET/HEAD) admin requests run their queries there. Flushes always go
+to the primary. After an admin mutation the admin reads from the primary for
+REPLICA_READ_YOUR_WRITES_SECONDS, tracked both in this worker and in a cookie
+so other workers honour it too. Without a replica everything uses the primary.
+"""
+import threading
+import time
+from flask import g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+PRIMARY_COOKIE = 'read_primary_until'
+READ_METHODS = ('GET', 'HEAD')
+
+_recent_writers = {}
+_recent_writers_lock = threading.Lock()
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica when the request allows it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('_use_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_app(app):
+    app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 10)
+    window = app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+
+    if REPLICA_BIND not in (app.config.get('SQLALCHEMY_BINDS') or {}):
+        return
+
+    @app.before_request
+    def route_reads():
+        if request.blueprint != 'admin' or request.method not in READ_METHODS:
+            return
+        if _wrote_recently(window):
+            return
+        g._use_replica = True
+
+    @app.after_request
+    def remember_writes(response):
+        if (request.blueprint == 'admin' and request.method not in READ_METHODS
+                and response.status_code < 400):
+            until = time.time() + window
+            writer = _writer_key()
+            if writer:
+                with _recent_writers_lock:
+                    _recent_writers[writer] = until
+                    for key in [k for k, v in _recent_writers.items() if v < time.time()]:
+                        del _recent_writers[key]
+            response.set_cookie(PRIMARY_COOKIE, str(int(until)), max_age=window,
+                                httponly=True, samesite='Lax', secure=request.is_secure)
+        return response
+
+
+def _writer_key():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _wrote_recently(window):
+    now = time.time()
+    try:
+        if float(request.cookies.get(PRIMARY_COOKIE, 0)) > now:
+            return True
+    except ValueError:
+        pass
+    writer = _writer_key()
+    with _recent_writers_lock:
+        return bool(writer) and _recent_writers.get(writer, 0) > now
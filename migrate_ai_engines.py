@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""Add ai_engines column to answers table for per-engine AI detection results"""
+
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        columns = [c['name'] for c in inspect(db.engine).get_columns('answers')]
+        
+        if 'ai_engines' not in columns:
+            db.session.execute(text("ALTER TABLE answers ADD COLUMN ai_engines JSON"))
+            db.session.commit()
+            print("✅ Column 'ai_engines' added successfully!")
+        else:
+            print("ℹ️  Column 'ai_engines' already exists")
+            
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
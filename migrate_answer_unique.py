@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Add a unique index on answers (session_id, question_id), dropping duplicate answers first"""
+
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        inspector = inspect(db.engine)
+        names = [c['name'] for c in inspector.get_unique_constraints('answers')] + \
+                [i['name'] for i in inspector.get_indexes('answers')]
+
+        if 'uq_answers_session_question' not in names:
+            # Overlapping submits could store one question twice; keep the newest answer
+            removed = db.session.execute(text(
+                "DELETE FROM answers WHERE id NOT IN "
+                "(SELECT MAX(id) FROM answers GROUP BY session_id, question_id)"
+            )).rowcount
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX uq_answers_session_question ON answers (session_id, question_id)"
+            ))
+            db.session.commit()
+            print(f"✅ Unique index added successfully! Removed {removed} duplicate answers")
+        else:
+            print("ℹ️  Unique index on answers (session_id, question_id) already exists")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""Add deleted_at column to exams table for archive-mode deletion"""
+
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        columns = [c['name'] for c in inspect(db.engine).get_columns('exams')]
+        
+        if 'deleted_at' not in columns:
+            db.session.execute(text("ALTER TABLE exams ADD COLUMN deleted_at TIMESTAMP"))
+            db.session.commit()
+            print("✅ Column 'deleted_at' added successfully!")
+        else:
+            print("ℹ️  Column 'deleted_at' already exists")
+            
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
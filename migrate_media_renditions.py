@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""Add media_renditions column to exam_sessions table for review renditions"""
+
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        columns = [c['name'] for c in inspect(db.engine).get_columns('exam_sessions')]
+        
+        if 'media_renditions' not in columns:
+            db.session.execute(text("ALTER TABLE exam_sessions ADD COLUMN media_renditions JSON"))
+            db.session.commit()
+            print("✅ Column 'media_renditions' added successfully!")
+        else:
+            print("ℹ️  Column 'media_renditions' already exists")
+            
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
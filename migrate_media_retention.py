@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""Add media_retention_days column to exams table for media GC"""
+
+from app import create_app
+from models import db
+from sqlalchemy import inspect, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        columns = [c['name'] for c in inspect(db.engine).get_columns('exams')]
+        
+        if 'media_retention_days' not in columns:
+            db.session.execute(text("ALTER TABLE exams ADD COLUMN media_retention_days INTEGER"))
+            db.session.commit()
+            print("✅ Column 'media_retention_days' added successfully!")
+        else:
+            print("ℹ️  Column 'media_retention_days' already exists")
+            
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
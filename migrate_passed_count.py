@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""Add passed_count column to exam_analytics table and backfill it from sessions"""
+
+from app import create_app
+from models import db, ExamAnalytics
+from services.analytics import rebuild_exam_analytics
+from sqlalchemy import inspect, select, text
+
+app = create_app()
+
+with app.app_context():
+    try:
+        columns = [c['name'] for c in inspect(db.engine).get_columns('exam_analytics')]
+        
+        if 'passed_count' not in columns:
+            db.session.execute(text("ALTER TABLE exam_analytics ADD COLUMN passed_count INTEGER NOT NULL DEFAULT 0"))
+            for exam_id in db.session.scalars(select(ExamAnalytics.exam_id)).all():
+                rebuild_exam_analytics(exam_id)
+            db.session.commit()
+            print("✅ Column 'passed_count' added and backfilled successfully!")
+        else:
+            print("ℹ️  Column 'passed_count' already exists")
+            
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error: {e}")
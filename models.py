@@ -1,8 +1,9 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
+from middleware.replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     """User model for admin and candidates"""
@@ -59,9 +60,20 @@ class Exam(db.Model):
     enable_video_monitoring = db.Column(db.Boolean, default=True)
     enable_ai_detection = db.Column(db.Boolean, default=True)
     
+    # Days to keep recordings/screenshots after a session; NULL uses MEDIA_RETENTION_DAYS
+    media_retention_days = db.Column(db.Integer)
+    
+    # Set when an exam is archived; its rows are purged in the background
+    deleted_at = db.Column(db.DateTime)
+    
     # Relationships
     questions = db.relationship('Question', backref='exam', lazy=True, cascade='all, delete-orphan')
     sessions = db.relationship('ExamSession', backref='exam', lazy=True, cascade='all, delete-orphan')
+    
+    @classmethod
+    def get_live_or_404(cls, exam_id):
+        """Get an exam unless it is archived (pending purge)"""
+        return cls.query.filter(cls.id == exam_id, cls.deleted_at.is_(None)).first_or_404()
 
 
 class Question(db.Model):
@@ -105,6 +117,8 @@ class ExamSession(db.Model):
     paste_attempts = db.Column(db.Integer, default=0)
     suspicious_activity_count = db.Column(db.Integer, default=0)
     video_recording_path = db.Column(db.String(500))
+    # Review rendition and contact sheet keys and sizes (services/media_pipeline.py)
+    media_renditions = db.Column(db.JSON)
     
     # Scoring
     total_score = db.Column(db.Float)
@@ -118,6 +132,7 @@ class ExamSession(db.Model):
 class Answer(db.Model):
     """Student answers"""
     __tablename__ = 'answers'
+    __table_args__ = (db.UniqueConstraint('session_id', 'question_id', name='uq_answers_session_question'),)
     
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
@@ -130,6 +145,7 @@ class Answer(db.Model):
     is_ai_generated = db.Column(db.Boolean)
     ai_confidence = db.Column(db.Float)
     ai_analysis = db.Column(db.Text)
+    ai_engines = db.Column(db.JSON)  # Per-engine results behind the fused verdict
     
     score = db.Column(db.Float)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -138,6 +154,37 @@ class Answer(db.Model):
     question = db.relationship('Question', backref='answers')
 
 
+class AnswerDraft(db.Model):
+    """Autosaved open-ended answer drafts (no AI detection until final save)"""
+    __tablename__ = 'answer_drafts'
+    __table_args__ = (db.UniqueConstraint('session_id', 'question_id', name='uq_answer_drafts_session_question'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    
+    revision = db.Column(db.Integer, default=0, nullable=False)
+    draft_text = db.Column(db.Text, default='')
+    finalized_revision = db.Column(db.Integer)  # Revision last copied into answers with detection
+    
+    # Keystroke timing counters accumulated from the client
+    typing_stats = db.Column(db.JSON)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TypingEventBatch(db.Model):
+    """Append-only batches of packed keystroke events (see services/typing_analysis.py)"""
+    __tablename__ = 'typing_event_batches'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('exam_sessions.id'), nullable=False, index=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # Client batch counter, for ordering
+    events = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class ProctoringViolation(db.Model):
     """Proctoring violations log"""
     __tablename__ = 'proctoring_violations'
@@ -152,3 +199,67 @@ class ProctoringViolation(db.Model):
     
     # Optional screenshot or frame capture
     screenshot_path = db.Column(db.String(255))
+
+
+# Analytics summary tables, maintained incrementally by services/analytics.py
+# so dashboard reads do not scan sessions or answers.
+
+class ExamAnalytics(db.Model):
+    """Per-exam running totals updated on each submission"""
+    __tablename__ = 'exam_analytics'
+    
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), primary_key=True)
+    sessions_submitted = db.Column(db.Integer, default=0, nullable=False)
+    flagged_count = db.Column(db.Integer, default=0, nullable=False)
+    # Against the passing_score at submit time; rebuilt when passing_score changes
+    passed_count = db.Column(db.Integer, default=0, nullable=False)
+    percentage_sum = db.Column(db.Float, default=0.0, nullable=False)
+    percentage_sq_sum = db.Column(db.Float, default=0.0, nullable=False)
+
+
+class ExamScoreBucket(db.Model):
+    """
+    Submissions per whole percentage point (0-100), for the score histogram.
+    """
+    __tablename__ = 'exam_score_buckets'
+    
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class QuestionAnalytics(db.Model):
+    """
+    Item analysis sums for one question. x is the item score as a fraction of
+    its points, y the session percentage / 100; difficulty (p-value) and the
+    item-total discrimination index are derived from these sums.
+    """
+    __tablename__ = 'question_analytics'
+    
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    sum_x = db.Column(db.Float, default=0.0, nullable=False)
+    sum_x2 = db.Column(db.Float, default=0.0, nullable=False)
+    sum_y = db.Column(db.Float, default=0.0, nullable=False)
+    sum_y2 = db.Column(db.Float, default=0.0, nullable=False)
+    sum_xy = db.Column(db.Float, default=0.0, nullable=False)
+
+
+class QuestionOptionCount(db.Model):
+    """How often each MCQ option was chosen"""
+    __tablename__ = 'question_option_counts'
+    
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    option = db.Column(db.String(10), primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False, index=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ViolationCount(db.Model):
+    """Violations per exam and type, updated as they are reported"""
+    __tablename__ = 'violation_counts'
+    
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), primary_key=True)
+    violation_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
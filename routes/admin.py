@@ -1,19 +1,38 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, abort, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
-from models import db, Exam, Question, ExamSession, User, Answer, ProctoringViolation
+from models import db, Exam, Question, ExamSession, User, Answer, AnswerDraft, TypingEventBatch, ProctoringViolation
+from services.question_bank import parse_csv_questions, validate_questions
+from services.candidate_import import import_candidates
+from services.exam_purge import delete_exam_rows, start_purge
+from services.media_gc import start_media_gc
+from services.identity_cache import current_identity, invalidate_identity
+from services import events
+from services.analytics import exam_analytics, delete_question_analytics, rebuild_exam_analytics
+from services.typing_analysis import decode_events, analyze_events
+from services.serializers import Schema, json_response
+from services.fingerprints import find_similar_answers
+from sqlalchemy import and_, case, delete, insert, select, update, func, literal
 from datetime import datetime
 from functools import wraps
+import queue
+import time
 
 admin_bp = Blueprint('admin', __name__)
 
+def _is_admin():
+    # The signed is_admin claim rejects candidates without a lookup; the
+    # cached identity catches admins whose role was revoked since login.
+    if not get_jwt().get('is_admin'):
+        return False
+    identity = current_identity()
+    return bool(identity and identity.is_admin)
+
 def admin_required(fn):
     """Decorator to check if user is admin"""
     @wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        if not user or not user.is_admin:
+        if not _is_admin():
             return jsonify({'error': 'Admin access required'}), 403
         return fn(*args, **kwargs)
     return wrapper
@@ -22,7 +41,7 @@ def admin_required(fn):
 @admin_required
 def get_exams():
     """Get all exams (admin only)"""
-    exams = Exam.query.all()
+    exams = Exam.query.filter(Exam.deleted_at.is_(None)).all()
     return jsonify([{
         'id': exam.id,
         'title': exam.title,
@@ -37,7 +56,7 @@ def get_exams():
 @admin_required
 def get_exam(exam_id):
     """Get single exam with questions (admin only)"""
-    exam = Exam.query.get_or_404(exam_id)
+    exam = Exam.get_live_or_404(exam_id)
     
     questions = [{
         'id': q.id,
@@ -58,10 +77,18 @@ def get_exam(exam_id):
         'duration_minutes': exam.duration_minutes,
         'passing_score': exam.passing_score,
         'is_active': exam.is_active,
+        'media_retention_days': exam.media_retention_days,
         'questions': questions,
         'created_at': exam.created_at.isoformat()
     }), 200
 
+@admin_bp.route('/exams/<int:exam_id>/analytics', methods=['GET'])
+@admin_required
+def get_exam_analytics(exam_id):
+    """Score histogram, pass rate, item analysis and violation counts for an exam"""
+    exam = Exam.get_live_or_404(exam_id)
+    return jsonify(exam_analytics(exam)), 200
+
 @admin_bp.route('/exams', methods=['POST'])
 @admin_required
 def create_exam():
@@ -77,6 +104,7 @@ def create_exam():
         enable_copy_paste_prevention=data.get('enable_copy_paste_prevention', True),
         enable_video_monitoring=data.get('enable_video_monitoring', True),
         enable_ai_detection=data.get('enable_ai_detection', True),
+        media_retention_days=data.get('media_retention_days'),
         created_by=int(get_jwt_identity())
     )
     
@@ -92,15 +120,20 @@ def create_exam():
 @admin_required
 def update_exam(exam_id):
     """Update an exam"""
-    exam = Exam.query.get_or_404(exam_id)
+    exam = Exam.get_live_or_404(exam_id)
     data = request.get_json()
     
     exam.title = data.get('title', exam.title)
     exam.description = data.get('description', exam.description)
     exam.duration_minutes = data.get('duration_minutes', exam.duration_minutes)
+    passing_score = exam.passing_score
     exam.passing_score = data.get('passing_score', exam.passing_score)
     exam.is_active = data.get('is_active', exam.is_active)
+    exam.media_retention_days = data.get('media_retention_days', exam.media_retention_days)
     
+    if exam.passing_score != passing_score:
+        # The pass count is kept against the threshold at submit time
+        rebuild_exam_analytics(exam.id)
     db.session.commit()
     
     return jsonify({'message': 'Exam updated successfully'}), 200
@@ -108,35 +141,21 @@ def update_exam(exam_id):
 @admin_bp.route('/exams/<int:exam_id>', methods=['DELETE'])
 @admin_required
 def delete_exam(exam_id):
-    """Delete an exam"""
-    from models import ProctoringViolation, Answer
-    exam = Exam.query.get_or_404(exam_id)
+    """Delete an exam, or archive it and purge its rows in the background (?archive=true)"""
+    exam = Exam.get_live_or_404(exam_id)
+    archive = request.args.get('archive', 'false').lower() in ('1', 'true', 'yes')
     
     try:
-        # Get all sessions for this exam
-        sessions = ExamSession.query.filter_by(exam_id=exam_id).all()
-        session_ids = [s.id for s in sessions]
+        if archive:
+            exam.deleted_at = datetime.utcnow()
+            exam.is_active = False
+            db.session.commit()
+            start_purge(current_app._get_current_object(), exam_id)
+            return jsonify({'message': 'Exam archived; data is being purged'}), 202
         
-        # Delete in proper order to avoid foreign key violations
-        if session_ids:
-            # 1. Delete proctoring violations first
-            for session_id in session_ids:
-                ProctoringViolation.query.filter_by(session_id=session_id).delete()
-            db.session.flush()
-            
-            # 2. Delete answers
-            for session_id in session_ids:
-                Answer.query.filter_by(session_id=session_id).delete()
-            db.session.flush()
-            
-            # 3. Delete sessions
-            for session in sessions:
-                db.session.delete(session)
-            db.session.flush()
-        
-        # 4. Delete the exam (this will cascade to questions)
-        db.session.delete(exam)
+        delete_exam_rows(exam_id)
         db.session.commit()
+        invalidate_identity()
         
         return jsonify({'message': 'Exam deleted successfully'}), 200
     except Exception as e:
@@ -150,7 +169,7 @@ def delete_exam(exam_id):
 @admin_required
 def add_question(exam_id):
     """Add a question to an exam"""
-    exam = Exam.query.get_or_404(exam_id)
+    exam = Exam.get_live_or_404(exam_id)
     data = request.get_json()
     
     question = Question(
@@ -176,6 +195,99 @@ def add_question(exam_id):
         'question_id': question.id
     }), 201
 
+@admin_bp.route('/exams/<int:exam_id>/questions/bulk', methods=['POST'])
+@admin_required
+def bulk_add_questions(exam_id):
+    """Import a question bank (JSON list or CSV) into an exam in one transaction"""
+    Exam.get_live_or_404(exam_id)
+    
+    if 'file' in request.files:
+        items = parse_csv_questions(request.files['file'].read())
+    elif request.mimetype == 'text/csv':
+        items = parse_csv_questions(request.get_data())
+    else:
+        data = request.get_json(silent=True)
+        items = data.get('questions') if isinstance(data, dict) else data
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No questions provided'}), 400
+    
+    max_order = db.session.query(func.coalesce(func.max(Question.order), 0)).filter(
+        Question.exam_id == exam_id
+    ).scalar()
+    
+    rows, errors = validate_questions(items, exam_id, start_order=max_order + 1)
+    if errors:
+        return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+    
+    db.session.execute(insert(Question), rows)
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Questions imported successfully',
+        'imported': len(rows)
+    }), 201
+
+@admin_bp.route('/exams/<int:exam_id>/clone', methods=['POST'])
+@admin_required
+def clone_exam(exam_id):
+    """Copy an exam and its questions with INSERT ... SELECT"""
+    exam = Exam.get_live_or_404(exam_id)
+    data = request.get_json(silent=True) or {}
+    now = datetime.utcnow()
+    
+    exam_columns = [
+        'title', 'description', 'duration_minutes', 'passing_score', 'is_active',
+        'created_by', 'created_at', 'enable_tab_detection', 'enable_copy_paste_prevention',
+        'enable_video_monitoring', 'enable_ai_detection', 'media_retention_days'
+    ]
+    exam_select = select(
+        literal(data.get('title') or f'{exam.title} (Copy)'),
+        Exam.description,
+        Exam.duration_minutes,
+        Exam.passing_score,
+        literal(bool(data.get('is_active', False))),
+        literal(int(get_jwt_identity())),
+        literal(now),
+        Exam.enable_tab_detection,
+        Exam.enable_copy_paste_prevention,
+        Exam.enable_video_monitoring,
+        Exam.enable_ai_detection,
+        Exam.media_retention_days
+    ).where(Exam.id == exam_id)
+    
+    new_exam_id = db.session.execute(
+        insert(Exam).from_select(exam_columns, exam_select).returning(Exam.id)
+    ).scalar_one()
+    
+    question_columns = [
+        'exam_id', 'question_type', 'question_text', 'points', 'order',
+        'options', 'correct_answer', 'max_words', 'sample_answer', 'created_at'
+    ]
+    question_select = select(
+        literal(new_exam_id),
+        Question.question_type,
+        Question.question_text,
+        Question.points,
+        Question.order,
+        Question.options,
+        Question.correct_answer,
+        Question.max_words,
+        Question.sample_answer,
+        literal(now)
+    ).where(Question.exam_id == exam_id)
+    
+    copied = db.session.execute(
+        insert(Question).from_select(question_columns, question_select)
+    ).rowcount
+    db.session.commit()
+    
+    return jsonify({
+        'message': 'Exam cloned successfully',
+        'exam_id': new_exam_id,
+        'questions_copied': copied
+    }), 201
+
 @admin_bp.route('/questions/<int:question_id>', methods=['PUT'])
 @admin_required
 def update_question(question_id):
@@ -203,81 +315,195 @@ def update_question(question_id):
 def delete_question(question_id):
     """Delete a question"""
     question = Question.query.get_or_404(question_id)
+    delete_question_analytics(question_id)
+    # Drafts and keystroke batches reference the question without an ORM cascade
+    for model in (AnswerDraft, TypingEventBatch):
+        db.session.execute(
+            delete(model).where(model.question_id == question_id),
+            execution_options={'synchronize_session': False}
+        )
     db.session.delete(question)
     db.session.commit()
     
     return jsonify({'message': 'Question deleted successfully'}), 200
 
+SESSION_FIELDS = {
+    'id': ExamSession.id,
+    'exam_title': Exam.title,
+    'candidate_name': User.full_name,
+    'candidate_email': User.email,
+    'started_at': ExamSession.started_at,
+    'submitted_at': ExamSession.submitted_at,
+    'status': ExamSession.status,
+    'total_score': ExamSession.total_score,
+    'percentage': ExamSession.percentage
+}
+PROCTORING_STATS_FIELDS = {
+    'tab_switches': ExamSession.tab_switches,
+    'copy_attempts': ExamSession.copy_attempts,
+    'paste_attempts': ExamSession.paste_attempts,
+    'suspicious_activity_count': ExamSession.suspicious_activity_count
+}
+SESSION_LIST_SCHEMA = Schema({**SESSION_FIELDS, **PROCTORING_STATS_FIELDS})
+SESSION_DETAIL_SCHEMA = Schema({
+    **SESSION_FIELDS,
+    'video_recording_path': ExamSession.video_recording_path,
+    'media_renditions': ExamSession.media_renditions,
+    'proctoring_stats': PROCTORING_STATS_FIELDS
+})
+SESSION_ANSWER_SCHEMA = Schema({
+    'question_id': Answer.question_id,
+    'question_text': Question.question_text,
+    'question_type': Question.question_type,
+    'answer_text': Answer.answer_text,
+    'selected_option': Answer.selected_option,
+    'correct_answer': case((Question.question_type == 'mcq', Question.correct_answer)),
+    'is_ai_generated': Answer.is_ai_generated,
+    'ai_confidence': Answer.ai_confidence,
+    'ai_analysis': Answer.ai_analysis,
+    'ai_engines': Answer.ai_engines,
+    'score': Answer.score,
+    'points': Question.points,
+    'typing_stats': AnswerDraft.typing_stats
+})
+VIOLATION_SCHEMA = Schema({
+    'id': ProctoringViolation.id,
+    'violation_type': ProctoringViolation.violation_type,
+    'description': ProctoringViolation.description,
+    'timestamp': ProctoringViolation.timestamp,
+    'severity': ProctoringViolation.severity
+})
+
 @admin_bp.route('/sessions', methods=['GET'])
 @admin_required
 def get_all_sessions():
     """Get all exam sessions"""
-    sessions = ExamSession.query.all()
-    
-    return jsonify([{
-        'id': session.id,
-        'exam_title': session.exam.title,
-        'candidate_name': session.candidate.full_name,
-        'candidate_email': session.candidate.email,
-        'started_at': session.started_at.isoformat(),
-        'submitted_at': session.submitted_at.isoformat() if session.submitted_at else None,
-        'status': session.status,
-        'total_score': session.total_score,
-        'percentage': session.percentage,
-        'tab_switches': session.tab_switches,
-        'copy_attempts': session.copy_attempts,
-        'paste_attempts': session.paste_attempts,
-        'suspicious_activity_count': session.suspicious_activity_count
-    } for session in sessions]), 200
+    rows = db.session.execute(
+        SESSION_LIST_SCHEMA.select()
+        .join(Exam, Exam.id == ExamSession.exam_id)
+        .join(User, User.id == ExamSession.candidate_id)
+        .order_by(ExamSession.id)
+    )
+    return json_response(SESSION_LIST_SCHEMA.many(rows))
 
 @admin_bp.route('/sessions/<int:session_id>', methods=['GET'])
 @admin_required
 def get_session_details(session_id):
     """Get detailed session information"""
+    row = db.session.execute(
+        SESSION_DETAIL_SCHEMA.select()
+        .join(Exam, Exam.id == ExamSession.exam_id)
+        .join(User, User.id == ExamSession.candidate_id)
+        .where(ExamSession.id == session_id)
+    ).first()
+    if row is None:
+        abort(404)
+    
+    answers = db.session.execute(
+        SESSION_ANSWER_SCHEMA.select()
+        .join(Question, Question.id == Answer.question_id)
+        .outerjoin(AnswerDraft, and_(AnswerDraft.session_id == Answer.session_id,
+                                     AnswerDraft.question_id == Answer.question_id))
+        .where(Answer.session_id == session_id)
+        .order_by(Answer.id)
+    )
+    violations = db.session.execute(
+        VIOLATION_SCHEMA.select()
+        .where(ProctoringViolation.session_id == session_id)
+        .order_by(ProctoringViolation.id)
+    )
+    
+    session = SESSION_DETAIL_SCHEMA.row(row)
+    session['answers'] = SESSION_ANSWER_SCHEMA.many(answers)
+    session['violations'] = VIOLATION_SCHEMA.many(violations)
+    return json_response(session)
+
+@admin_bp.route('/sessions/<int:session_id>/similarity', methods=['GET'])
+@admin_required
+def get_session_similarity(session_id):
+    """Match a session's open-ended answers against every answer ever submitted"""
     session = ExamSession.query.get_or_404(session_id)
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    rows = db.session.execute(
+        select(Answer.id, Answer.question_id, Answer.answer_text, Question.question_text)
+        .join(Question, Question.id == Answer.question_id)
+        .where(Answer.session_id == session_id, Question.question_type == 'open_ended')
+        .order_by(Answer.id)
+    ).all()
     
-    answers = [{
-        'question_id': answer.question_id,
-        'question_text': answer.question.question_text,
-        'question_type': answer.question.question_type,
-        'answer_text': answer.answer_text,
-        'selected_option': answer.selected_option,
-        'correct_answer': answer.question.correct_answer if answer.question.question_type == 'mcq' else None,
-        'is_ai_generated': answer.is_ai_generated,
-        'ai_confidence': answer.ai_confidence,
-        'ai_analysis': answer.ai_analysis,
-        'score': answer.score,
-        'points': answer.question.points
-    } for answer in session.answers]
-    
-    violations = [{
-        'id': v.id,
-        'violation_type': v.violation_type,
-        'description': v.description,
-        'timestamp': v.timestamp.isoformat(),
-        'severity': v.severity
-    } for v in session.violations]
+    answers = []
+    for answer_id, question_id, answer_text, question_text in rows:
+        fingerprints, matches = find_similar_answers(
+            answer_text, exclude_candidate=session.candidate_id, exclude_answers=[answer_id],
+            ignore_text=question_text, limit=limit
+        )
+        answers.append({'answer_id': answer_id, 'question_id': question_id,
+                        'fingerprints': fingerprints, 'matches': matches})
     
-    return jsonify({
-        'id': session.id,
-        'exam_title': session.exam.title,
-        'candidate_name': session.candidate.full_name,
-        'candidate_email': session.candidate.email,
-        'started_at': session.started_at.isoformat(),
-        'submitted_at': session.submitted_at.isoformat() if session.submitted_at else None,
-        'status': session.status,
-        'total_score': session.total_score,
-        'percentage': session.percentage,
-        'video_recording_path': session.video_recording_path,
-        'proctoring_stats': {
-            'tab_switches': session.tab_switches,
-            'copy_attempts': session.copy_attempts,
-            'paste_attempts': session.paste_attempts,
-            'suspicious_activity_count': session.suspicious_activity_count
-        },
-        'answers': answers,
-        'violations': violations
-    }), 200
+    # Matches may come from purged exams; label the ones that still exist
+    exam_ids = {m['exam_id'] for a in answers for m in a['matches'] if m['exam_id']}
+    titles = dict(db.session.execute(select(Exam.id, Exam.title).where(Exam.id.in_(exam_ids))).all()) if exam_ids else {}
+    for answer in answers:
+        for match in answer['matches']:
+            match['exam_title'] = titles.get(match['exam_id'])
+    
+    return jsonify({'session_id': session_id, 'answers': answers}), 200
+
+@admin_bp.route('/sessions/<int:session_id>/typing/<int:question_id>', methods=['GET'])
+@admin_required
+def get_typing_analysis(session_id, question_id):
+    """Analyze the keystroke log of one answer for paste bursts and robotic rhythm"""
+    ExamSession.query.get_or_404(session_id)
+    batches = db.session.scalars(
+        select(TypingEventBatch.events)
+        .where(TypingEventBatch.session_id == session_id, TypingEventBatch.question_id == question_id)
+        .order_by(TypingEventBatch.seq, TypingEventBatch.id)
+    ).all()
+    
+    result = analyze_events(decode_events(batches))
+    result['stored_bytes'] = sum(len(b) for b in batches)
+    return jsonify(result), 200
+
+@admin_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def monitoring_stream():
+    """
+    Server-Sent Events feed of session and violation events (?exam_id= to filter).
+    Each open stream holds a worker, so it needs gevent, eventlet or gthread
+    workers (SSE_ENABLED); otherwise it answers 204, which tells EventSource
+    not to reconnect, and the dashboard falls back to polling.
+    """
+    if not _is_admin():
+        return jsonify({'error': 'Admin access required'}), 403
+    if not current_app.config['SSE_ENABLED']:
+        return '', 204
+    
+    exam_id = request.args.get('exam_id', type=int)
+    keepalive = current_app.config['SSE_KEEPALIVE_SECONDS']
+    max_seconds = current_app.config['SSE_MAX_SECONDS']
+    broker = events.get_broker()
+    
+    def generate():
+        subscription = broker.subscribe()
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield "retry: 2000\n\n"
+            while time.monotonic() < deadline:
+                try:
+                    event = subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if exam_id and event.get('exam_id') != exam_id:
+                    continue
+                yield events.format_sse(event)
+        finally:
+            broker.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 @admin_bp.route('/candidates', methods=['GET'])
 @admin_required
@@ -311,16 +537,102 @@ def assign_exam_to_candidate(candidate_id):
         return jsonify({'error': 'exam_id is required'}), 400
     
     candidate = User.query.get_or_404(candidate_id)
-    exam = Exam.query.get_or_404(exam_id)
+    exam = Exam.get_live_or_404(exam_id)
     
     if candidate.is_admin:
         return jsonify({'error': 'Cannot assign exam to admin user'}), 400
     
     candidate.assigned_exam_id = exam_id
     db.session.commit()
+    invalidate_identity(candidate.id)
     
     return jsonify({
         'message': 'Exam assigned successfully',
         'candidate': candidate.full_name,
         'exam': exam.title
     }), 200
+
+@admin_bp.route('/candidates/import', methods=['POST'])
+@admin_required
+def import_candidates_csv():
+    """Import candidates from a CSV upload, optionally assigning an exam"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No CSV file provided'}), 400
+    
+    exam_id = request.form.get('exam_id', type=int)
+    if exam_id:
+        Exam.get_live_or_404(exam_id)
+    
+    created, errors = import_candidates(request.files['file'].stream, exam_id=exam_id)
+    
+    return jsonify({
+        'message': 'Candidate import finished',
+        'created': created,
+        'failed': len(errors),
+        'errors': errors
+    }), 200
+
+@admin_bp.route('/candidates/bulk-assign', methods=['POST'])
+@admin_required
+def bulk_assign_exam():
+    """Assign an exam to many candidates with a single UPDATE"""
+    data = request.get_json() or {}
+    exam_id = data.get('exam_id')
+    
+    if not exam_id:
+        return jsonify({'error': 'exam_id is required'}), 400
+    
+    exam = Exam.get_live_or_404(exam_id)
+    
+    conditions = [User.is_admin.is_(False)]
+    candidate_ids = data.get('candidate_ids')
+    if candidate_ids is not None:
+        if not isinstance(candidate_ids, list):
+            return jsonify({'error': 'candidate_ids must be a list'}), 400
+        conditions.append(User.id.in_(candidate_ids))
+    if data.get('position_applied'):
+        conditions.append(User.position_applied == data['position_applied'])
+    if data.get('email_domain'):
+        if not isinstance(data['email_domain'], str):
+            return jsonify({'error': 'email_domain must be a string'}), 400
+        # autoescape keeps % and _ in the domain literal
+        conditions.append(func.lower(User.email).endswith('@' + data['email_domain'].lower(), autoescape=True))
+    if data.get('unassigned_only'):
+        conditions.append(User.assigned_exam_id.is_(None))
+    if data.get('created_after'):
+        try:
+            conditions.append(User.created_at >= datetime.fromisoformat(data['created_after']))
+        except ValueError:
+            return jsonify({'error': 'created_after must be an ISO date'}), 400
+    
+    if len(conditions) == 1 and not data.get('all'):
+        return jsonify({'error': 'Provide candidate_ids or a filter (or set all=true)'}), 400
+    
+    errors = []
+    if candidate_ids:
+        # One lookup to report ids that the UPDATE will not touch
+        matched = set(db.session.scalars(select(User.id).where(*conditions)))
+        errors = [{'candidate_id': cid, 'error': 'Candidate not found or not eligible'}
+                  for cid in candidate_ids if cid not in matched]
+    
+    result = db.session.execute(
+        update(User).where(*conditions).values(assigned_exam_id=exam.id),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    invalidate_identity()
+    
+    return jsonify({
+        'message': 'Exam assigned successfully',
+        'exam': exam.title,
+        'assigned': result.rowcount,
+        'errors': errors
+    }), 200
+
+@admin_bp.route('/media/gc', methods=['POST'])
+@admin_required
+def run_media_gc():
+    """Start a media GC pass in the background (?dry_run=true only reports); the report is logged"""
+    dry_run = request.args.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
+    start_media_gc(current_app._get_current_object(), dry_run=dry_run)
+    return jsonify({'message': 'Media GC started', 'dry_run': dry_run}), 202
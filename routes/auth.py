@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from models import db, User
+from services.identity_cache import current_identity
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -78,7 +79,7 @@ def get_current_user():
     
     user_id = int(get_jwt_identity())
     print(f"DEBUG: User ID from token: {user_id}")
-    user = User.query.get(user_id)
+    user = current_identity()
     
     if not user:
         return jsonify({'error': 'User not found'}), 404
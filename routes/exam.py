@@ -1,8 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Exam, Question, ExamSession, Answer, User
+from models import db, Exam, Question, ExamSession, Answer, AnswerDraft, TypingEventBatch
 from datetime import datetime, timedelta
-from services.ai_detector import detect_ai_content
+from services.ai_detector import detect_ai_content, detect_ai_content_many
+from services.identity_cache import current_identity
+from services import events
+from services.analytics import record_submission
+from services.fingerprints import index_session_answers
+from services.autosave import apply_diff, merge_typing_stats
+from services.typing_analysis import is_valid_batch
+from sqlalchemy import select, update, or_
+from sqlalchemy.exc import IntegrityError
 
 exam_bp = Blueprint('exam', __name__)
 
@@ -11,14 +19,17 @@ exam_bp = Blueprint('exam', __name__)
 def get_available_exams():
     """Get assigned exam for candidate"""
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = current_identity()
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
     
     result = []
     
     # Only show assigned exam
     if user.assigned_exam_id:
         exam = Exam.query.get(user.assigned_exam_id)
-        if exam and exam.is_active:
+        if exam and exam.is_active and exam.deleted_at is None:
             # Check if candidate has already taken this exam
             existing_session = ExamSession.query.filter_by(
                 exam_id=exam.id,
@@ -48,7 +59,7 @@ def get_available_exams():
 def start_exam(exam_id):
     """Start an exam session"""
     user_id = int(get_jwt_identity())
-    exam = Exam.query.get_or_404(exam_id)
+    exam = Exam.get_live_or_404(exam_id)
     
     if not exam.is_active:
         return jsonify({'error': 'This exam is not currently active'}), 400
@@ -72,6 +83,9 @@ def start_exam(exam_id):
     db.session.add(session)
     db.session.commit()
     
+    events.publish(events.SESSION_STARTED, session_id=session.id, exam_id=exam.id,
+                   candidate_id=user_id, exam_title=exam.title)
+    
     # Get questions (without correct answers for MCQ)
     questions = []
     for q in sorted(exam.questions, key=lambda x: x.order):
@@ -104,6 +118,19 @@ def start_exam(exam_id):
         }
     }), 201
 
+def set_open_ended_answer(answer, session, answer_text, ai_result=None):
+    """Store open-ended answer text and run AI detection if the exam enables it"""
+    answer.answer_text = answer_text
+    
+    # AI detection for open-ended answers
+    if ai_result is None and session.exam.enable_ai_detection and answer.answer_text:
+        ai_result = detect_ai_content(answer.answer_text)
+    if ai_result is not None:
+        answer.is_ai_generated = ai_result['is_ai_generated']
+        answer.ai_confidence = ai_result['confidence']
+        answer.ai_analysis = ai_result['analysis']
+        answer.ai_engines = ai_result.get('engines')
+
 @exam_bp.route('/session/<int:session_id>/answer', methods=['POST'])
 @jwt_required()
 def submit_answer(session_id):
@@ -121,6 +148,22 @@ def submit_answer(session_id):
     data = request.get_json()
     question_id = data['question_id']
     question = Question.query.get_or_404(question_id)
+    exam_id = session.exam_id
+    is_mcq = question.question_type == 'mcq'
+    
+    ai_result = None
+    if not is_mcq and data.get('answer_text') and session.exam.enable_ai_detection:
+        # End the read transaction so no DB connection is held while Groq runs
+        db.session.commit()
+        ai_result = detect_ai_content(data['answer_text'])
+    
+    # Lock the session row and re-check it: the exam may have been submitted during detection
+    status = db.session.scalar(
+        select(ExamSession.status).where(ExamSession.id == session_id).with_for_update()
+    )
+    if status != 'in_progress':
+        db.session.rollback()
+        return jsonify({'error': 'Session is not active'}), 400
     
     # Check if answer already exists
     existing_answer = Answer.query.filter_by(
@@ -139,7 +182,7 @@ def submit_answer(session_id):
         )
     
     # Process based on question type
-    if question.question_type == 'mcq':
+    if is_mcq:
         answer.selected_option = data['selected_option']
         # Auto-grade MCQ
         if answer.selected_option == question.correct_answer:
@@ -147,25 +190,143 @@ def submit_answer(session_id):
         else:
             answer.score = 0
     else:  # open_ended
-        answer.answer_text = data['answer_text']
+        set_open_ended_answer(answer, session, data['answer_text'], ai_result)
         
-        # AI detection for open-ended answers
-        if session.exam.enable_ai_detection and answer.answer_text:
-            ai_result = detect_ai_content(answer.answer_text)
-            answer.is_ai_generated = ai_result['is_ai_generated']
-            answer.ai_confidence = ai_result['confidence']
-            answer.ai_analysis = ai_result['analysis']
+        # The final save supersedes any autosaved draft up to this revision
+        if data.get('revision') is not None:
+            db.session.execute(
+                update(AnswerDraft)
+                .where(AnswerDraft.session_id == session_id, AnswerDraft.question_id == question_id)
+                .values(finalized_revision=data['revision'])
+            )
     
     if not existing_answer:
         db.session.add(answer)
     
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Concurrent first save for the same question
+        db.session.rollback()
+        return jsonify({'error': 'Answer was saved concurrently, please retry'}), 409
+    
+    events.publish(events.ANSWER_SAVED, session_id=session_id, exam_id=exam_id,
+                   question_id=question_id, is_ai_generated=answer.is_ai_generated)
     
     return jsonify({
         'message': 'Answer saved successfully',
         'answer_id': answer.id
     }), 200
 
+@exam_bp.route('/session/<int:session_id>/autosave', methods=['POST'])
+@jwt_required()
+def autosave_answer(session_id):
+    """
+    Cheap draft save for open-ended answers: accepts full text or a splice
+    against base_revision, and never runs AI detection.
+    """
+    user_id = int(get_jwt_identity())
+    row = db.session.execute(
+        select(ExamSession.candidate_id, ExamSession.status, ExamSession.exam_id).where(ExamSession.id == session_id)
+    ).first()
+    
+    if not row:
+        return jsonify({'error': 'Session not found'}), 404
+    if row.candidate_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if row.status != 'in_progress':
+        return jsonify({'error': 'Session is not active'}), 400
+    
+    data = request.get_json() or {}
+    question_id = data.get('question_id')
+    revision = data.get('revision')
+    if not isinstance(question_id, int) or not isinstance(revision, int):
+        return jsonify({'error': 'question_id and revision are required'}), 400
+    
+    # Drafts become answers on submit, so only this exam's open-ended questions
+    question_found = db.session.scalar(
+        select(Question.id).where(Question.id == question_id, Question.exam_id == row.exam_id,
+                                  Question.question_type == 'open_ended')
+    )
+    if not question_found:
+        return jsonify({'error': 'Open-ended question not found in this exam'}), 404
+    
+    draft = AnswerDraft.query.filter_by(session_id=session_id, question_id=question_id).first()
+    
+    # Out-of-order request from a slower connection; keep the newer draft
+    if draft and revision <= draft.revision:
+        return jsonify({'revision': draft.revision, 'stale': True}), 200
+    
+    if 'text' in data:
+        text = data['text'] or ''
+        if not isinstance(text, str):
+            return jsonify({'error': 'text must be a string'}), 400
+    elif 'diff' in data:
+        current_revision = draft.revision if draft else 0
+        if data.get('base_revision') != current_revision:
+            return jsonify({'error': 'Revision mismatch', 'revision': current_revision}), 409
+        try:
+            text = apply_diff((draft.draft_text or '') if draft else '', data['diff'])
+        except TypeError as e:
+            return jsonify({'error': str(e)}), 400
+        except ValueError as e:
+            return jsonify({'error': str(e), 'revision': current_revision}), 409
+    else:
+        return jsonify({'error': 'text or diff is required'}), 400
+    
+    if not draft:
+        draft = AnswerDraft(session_id=session_id, question_id=question_id)
+        db.session.add(draft)
+    
+    draft.draft_text = text
+    draft.revision = revision
+    draft.typing_stats = merge_typing_stats(draft.typing_stats, data.get('typing'))
+    
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Concurrent first save for the same question; client resends full text
+        db.session.rollback()
+        return jsonify({'error': 'Revision mismatch', 'revision': 0}), 409
+    
+    return jsonify({'revision': draft.revision}), 200
+
+@exam_bp.route('/session/<int:session_id>/typing', methods=['POST'])
+@jwt_required()
+def upload_typing_events(session_id):
+    """Append a packed batch of keystroke events (?question_id=&seq=, binary body)"""
+    user_id = int(get_jwt_identity())
+    row = db.session.execute(
+        select(ExamSession.candidate_id, ExamSession.status, ExamSession.exam_id).where(ExamSession.id == session_id)
+    ).first()
+    
+    if not row:
+        return jsonify({'error': 'Session not found'}), 404
+    if row.candidate_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if row.status != 'in_progress':
+        return jsonify({'error': 'Session is not active'}), 400
+    
+    question_id = request.args.get('question_id', type=int)
+    seq = request.args.get('seq', type=int)
+    data = request.get_data()
+    
+    if question_id is None or seq is None:
+        return jsonify({'error': 'question_id and seq are required'}), 400
+    if not is_valid_batch(data):
+        return jsonify({'error': 'Invalid event batch'}), 400
+    
+    question_found = db.session.scalar(
+        select(Question.id).where(Question.id == question_id, Question.exam_id == row.exam_id)
+    )
+    if not question_found:
+        return jsonify({'error': 'Question not found in this exam'}), 404
+    
+    db.session.add(TypingEventBatch(session_id=session_id, question_id=question_id, seq=seq, events=data))
+    db.session.commit()
+    
+    return jsonify({'message': 'Events recorded'}), 201
+
 @exam_bp.route('/session/<int:session_id>/submit', methods=['POST'])
 @jwt_required()
 def submit_exam(session_id):
@@ -180,6 +341,47 @@ def submit_exam(session_id):
     if session.status != 'in_progress':
         return jsonify({'error': 'Session already submitted'}), 400
     
+    # Promote drafts that were autosaved after their last final save
+    pending_drafts = AnswerDraft.query.join(Question, Question.id == AnswerDraft.question_id).filter(
+        AnswerDraft.session_id == session_id,
+        Question.exam_id == session.exam_id,
+        Question.question_type == 'open_ended',
+        or_(AnswerDraft.finalized_revision.is_(None), AnswerDraft.finalized_revision < AnswerDraft.revision)
+    ).all()
+    drafts = [(d.id, d.question_id, d.draft_text, d.revision) for d in pending_drafts]
+    ai_results = [None] * len(drafts)
+    if drafts and session.exam.enable_ai_detection:
+        # Detect all drafts concurrently, without holding a DB connection
+        db.session.commit()
+        detect = [i for i, (_, _, text, _) in enumerate(drafts) if text]
+        for i, result in zip(detect, detect_ai_content_many([drafts[i][2] for i in detect])):
+            ai_results[i] = result
+    
+    # Claim the session: of overlapping submits (timer, button, retry) only one gets past here
+    claimed = db.session.execute(
+        update(ExamSession)
+        .where(ExamSession.id == session_id, ExamSession.status == 'in_progress')
+        .values(status='completed'),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return jsonify({'error': 'Session already submitted'}), 400
+    
+    if drafts:
+        existing_answers = {a.question_id: a for a in Answer.query.filter_by(session_id=session_id)}
+        for (draft_id, question_id, text, revision), ai_result in zip(drafts, ai_results):
+            answer = existing_answers.get(question_id)
+            if not answer:
+                answer = Answer(session_id=session_id, question_id=question_id)
+                db.session.add(answer)
+            set_open_ended_answer(answer, session, text, ai_result)
+        db.session.execute(update(AnswerDraft), [
+            {'id': draft_id, 'finalized_revision': revision} for draft_id, _, _, revision in drafts
+        ])
+        db.session.flush()
+        db.session.expire(session, ['answers'])
+    
     # Calculate total score
     total_score = 0
     total_possible = 0
@@ -198,8 +400,20 @@ def submit_exam(session_id):
     if session.suspicious_activity_count > 5 or session.tab_switches > 10:
         session.status = 'flagged'
     
+    # Counted once: only the request that claimed the session gets here
+    record_submission(session)
     db.session.commit()
     
+    try:
+        index_session_answers(session_id)
+    except Exception as e:
+        print(f"Error fingerprinting answers for session {session_id}: {str(e)}")
+    
+    events.publish(events.SESSION_SUBMITTED, session_id=session.id, exam_id=session.exam_id,
+                   status=session.status, percentage=session.percentage)
+    if session.status == 'flagged':
+        events.publish(events.SESSION_FLAGGED, session_id=session.id, exam_id=session.exam_id)
+    
     return jsonify({
         'message': 'Exam submitted successfully',
         'total_score': session.total_score,
@@ -1,9 +1,15 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models import db, ExamSession, ProctoringViolation
+from services import events
+from services.analytics import record_violation
+from services.storage import get_storage
+from services.media_pipeline import submit_recording
+from middleware.metrics import VIOLATIONS, RECORDING_BYTES, violation_label
 from datetime import datetime
+from sqlalchemy import update
 import base64
-import os
+import io
 
 proctoring_bp = Blueprint('proctoring', __name__)
 
@@ -49,17 +55,23 @@ def report_violation():
             header, encoded = screenshot_data.split(',', 1)
             screenshot_bytes = base64.b64decode(encoded)
             
-            # Save to file
-            filename = f"violation_{session_id}_{datetime.utcnow().timestamp()}.png"
-            filepath = os.path.join('recordings', filename)
+            # Save to media storage
+            key = f"violation_{session_id}_{datetime.utcnow().timestamp()}.png"
+            get_storage().save(key, io.BytesIO(screenshot_bytes), 'image/png')
+            RECORDING_BYTES.labels(kind='screenshot').inc(len(screenshot_bytes))
             
-            with open(filepath, 'wb') as f:
-                f.write(screenshot_bytes)
-            
-            violation.screenshot_path = filepath
+            violation.screenshot_path = key
     
     db.session.add(violation)
+    record_violation(session.exam_id, violation_type)
     db.session.commit()
+    VIOLATIONS.labels(violation_type=violation_label(violation_type)).inc()
+    
+    events.publish(events.VIOLATION_RECORDED, session_id=session.id, exam_id=session.exam_id,
+                   violation_id=violation.id, violation_type=violation_type,
+                   severity=violation.severity, tab_switches=session.tab_switches,
+                   copy_attempts=session.copy_attempts, paste_attempts=session.paste_attempts,
+                   total_violations=session.suspicious_activity_count)
     
     return jsonify({
         'message': 'Violation recorded',
@@ -149,22 +161,73 @@ def upload_recording():
     if session.candidate_id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    # Create recordings directory if it doesn't exist
-    recordings_dir = os.path.join(os.getcwd(), 'recordings')
-    os.makedirs(recordings_dir, exist_ok=True)
-    
-    # Save video file
-    filename = f"session_{session_id}_recording.webm"
-    filepath = os.path.join(recordings_dir, filename)
-    video.save(filepath)
-    
-    # Store filepath in session
-    session.video_recording_path = filepath
+    # Stream the video into media storage, without holding a DB connection
+    session_id = session.id
+    db.session.commit()
+    key = recording_key(session_id)
+    size = get_storage().save(key, video.stream, video.mimetype or 'video/webm')
+    RECORDING_BYTES.labels(kind='video').inc(size)
+    
+    # Store the storage key in session
+    db.session.execute(
+        update(ExamSession).where(ExamSession.id == session_id).values(video_recording_path=key),
+        execution_options={'synchronize_session': False}
+    )
     db.session.commit()
     
-    print(f"Video recording saved: {filepath}")
+    print(f"Video recording saved: {key} ({size} bytes)")
+    queue_recording_processing(session_id, key)
     
     return jsonify({
         'message': 'Recording uploaded successfully',
-        'filepath': filepath
+        'filepath': key
     }), 200
+
+@proctoring_bp.route('/recording/upload-url', methods=['POST'])
+@jwt_required()
+def recording_upload_url():
+    """Presigned URL for uploading a recording straight to storage (null when unsupported)"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    session = ExamSession.query.get_or_404(data.get('session_id'))
+    
+    if session.candidate_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    key = recording_key(session.id)
+    upload = get_storage().upload_url(key, 'video/webm', current_app.config['STORAGE_URL_EXPIRES'])
+    return jsonify({'key': key, 'upload': upload}), 200
+
+@proctoring_bp.route('/recording/complete', methods=['POST'])
+@jwt_required()
+def complete_recording_upload():
+    """Attach a recording uploaded through a presigned URL to its session"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    session = ExamSession.query.get_or_404(data.get('session_id'))
+    
+    if session.candidate_id != user_id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    key = recording_key(session.id)
+    size = get_storage().size(key)
+    if size is None:
+        return jsonify({'error': 'Recording has not been uploaded'}), 400
+    RECORDING_BYTES.labels(kind='video').inc(size)
+    
+    session.video_recording_path = key
+    db.session.commit()
+    queue_recording_processing(session.id, key)
+    
+    return jsonify({'message': 'Recording uploaded successfully', 'filepath': key}), 200
+
+def recording_key(session_id):
+    return f"session_{session_id}_recording.webm"
+
+def queue_recording_processing(session_id, key):
+    """Hand a new recording to the rendition pipeline, if enabled"""
+    if current_app.config['MEDIA_PROCESS_WORKERS'] > 0:
+        try:
+            submit_recording(current_app._get_current_object(), session_id, key)
+        except Exception as e:
+            print(f"Error queueing recording {key}: {str(e)}")
@@ -1,15 +1,93 @@
-from groq import Groq
-from flask import current_app
+from functools import lru_cache
+from middleware.profiling import record_external, request_timing
+from middleware.metrics import DETECTION_LATENCY, DETECTOR_RESULTS, GROQ_REQUESTS
+from services.ngram_detector import get_model as get_ngram_model
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import os
 import json
+import threading
+import time
 
-def detect_ai_content(text):
+# Per worker process. Under gevent/eventlet the blocking client below is
+# cooperative, so these bound in-flight Groq requests rather than threads.
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', '8'))
+GROQ_QUEUE_TIMEOUT = float(os.getenv('GROQ_QUEUE_TIMEOUT_SECONDS', '5'))
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT_SECONDS', '15'))
+
+
+def _engine_settings(name, default):
+    """Parse 'groq=0.6,ngram=0.3' style settings over the defaults"""
+    settings = dict(default)
+    for item in os.getenv(name, '').split(','):
+        if '=' in item:
+            engine, value = item.split('=', 1)
+            settings[engine.strip()] = float(value)
+    return settings
+
+
+# Engines run together on every answer; see detect_ai_content
+AI_DETECTORS = [name.strip() for name in os.getenv('AI_DETECTORS', 'groq,ngram,pattern').split(',') if name.strip()]
+AI_DETECTOR_WEIGHTS = _engine_settings('AI_DETECTOR_WEIGHTS', {'groq': 0.6, 'ngram': 0.3, 'pattern': 0.1})
+# Deadlines for engines on the pool; local engines run inline and are not cut short
+AI_DETECTOR_TIMEOUTS = _engine_settings('AI_DETECTOR_TIMEOUTS', {'groq': GROQ_QUEUE_TIMEOUT + GROQ_TIMEOUT})
+# Stop waiting once the fused confidence is certain to stay at or beyond this
+# (or at or below 1 - this), whatever the engines still running return
+AI_DETECTION_DECISIVE = float(os.getenv('AI_DETECTION_DECISIVE', '0.85'))
+AI_DETECTOR_THREADS = int(os.getenv('AI_DETECTOR_THREADS', str(4 * GROQ_MAX_CONCURRENCY)))
+
+_detectors = {}
+_local_detectors = set()
+
+
+@lru_cache(maxsize=4)
+def get_groq_client(api_key):
+    """Groq client per API key; the SDK is imported on first use, not at app boot"""
+    from groq import Groq
+    # No retries: a retried call would outlive the groq deadline in
+    # AI_DETECTOR_TIMEOUTS and hold its Groq slot after the request gave up
+    return Groq(api_key=api_key, timeout=GROQ_TIMEOUT, max_retries=0)
+
+
+@lru_cache(maxsize=1)
+def _groq_slots():
+    # Created on first use, after gunicorn's gevent worker has patched threading
+    return threading.BoundedSemaphore(GROQ_MAX_CONCURRENCY)
+
+
+@lru_cache(maxsize=1)
+def _detector_pool():
+    # Shared by all requests in the worker, created after gevent patching too
+    return ThreadPoolExecutor(max_workers=AI_DETECTOR_THREADS, thread_name_prefix='detector')
+
+
+def register_detector(name, local=False):
+    """
+    Decorator adding an engine. It takes the text and returns a
+    detect_ai_content style dict whose confidence is the probability the text
+    is AI-generated or plagiarised, or None when it cannot answer (not
+    configured, busy, failed). Enable it by listing it in AI_DETECTORS.
+    Local engines are quick CPU work and run on the calling thread; the rest
+    share the worker's detector pool.
+    """
+    def decorator(func):
+        _detectors[name] = func
+        if local:
+            _local_detectors.add(name)
+        else:
+            _local_detectors.discard(name)
+        return func
+    return decorator
+
+
+def detect_ai_content(text, timing=None):
     """
-    Detect if content is AI-generated using Groq's API or patterns
+    Detect if content is AI-generated with the AI_DETECTORS engines.
+    timing is the request's timing dict when called off the request thread.
     Returns: {
         'is_ai_generated': bool,
         'confidence': float (0-1),
-        'analysis': str
+        'analysis': str,
+        'engines': {name: engine result plus 'status' and 'ms'}
     }
     """
     
@@ -20,16 +98,140 @@ def detect_ai_content(text):
             'analysis': 'Text too short to analyze'
         }
     
-    # Check if Groq API key is configured
-    api_key = os.getenv('GROQ_API_KEY')
-    
-    if not api_key or api_key == 'your-groq-api-key-here':
-        # Fallback to pattern-based detection
-        return pattern_based_detection(text)
-    
+    return run_detectors(text, [name for name in AI_DETECTORS if name in _detectors], timing)
+
+
+def run_detectors(text, engines, timing=None):
+    """
+    Run engines concurrently, each until its own deadline, and fuse their
+    confidences by AI_DETECTOR_WEIGHTS. Local engines run on this thread
+    while the others are on the pool, so a pool busy with Groq calls cannot
+    time them out. Engines that time out, fail or cannot answer are left out
+    of the fusion. Returns as soon as the outcome is decisive; engines still
+    running are recorded as skipped. Per-engine results are returned under
+    'engines'.
+    """
+    pool = _detector_pool()
+    # Pool threads have no request context, so their time is recorded here
+    if timing is None:
+        timing = request_timing()
+    started = time.perf_counter()
+    pending = {pool.submit(_detectors[name], text): name for name in engines if name not in _local_detectors}
+    deadlines = {future: started + AI_DETECTOR_TIMEOUTS.get(name, GROQ_TIMEOUT) for future, name in pending.items()}
+    engine_results = {}
+
+    def finish(name, status, result=None, since=started):
+        DETECTOR_RESULTS.labels(engine=name, status=status).inc()
+        if name not in _local_detectors:
+            record_external(timing, name, time.perf_counter() - since)
+        engine_results[name] = dict(result or {}, status=status,
+                                    ms=round((time.perf_counter() - since) * 1000, 1))
+
+    for name in engines:
+        if name not in _local_detectors:
+            continue
+        engine_started = time.perf_counter()
+        try:
+            result = _detectors[name](text)
+        except Exception as e:
+            print(f"Error in {name} detector: {str(e)}")
+            finish(name, 'error', since=engine_started)
+            continue
+        finish(name, 'ok' if result is not None else 'unavailable', result, since=engine_started)
+
+    while pending:
+        if _is_decisive(engine_results, pending.values()):
+            for future, name in pending.items():
+                future.cancel()
+                finish(name, 'skipped')
+            break
+        now = time.perf_counter()
+        for future in [f for f in pending if deadlines[f] <= now]:
+            future.cancel()  # Only stops it if it has not started; its result is ignored either way
+            finish(pending.pop(future), 'timeout')
+        if not pending:
+            break
+        done, _ = wait(list(pending), timeout=min(deadlines[f] for f in pending) - now,
+                       return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error in {name} detector: {str(e)}")
+                finish(name, 'error')
+                continue
+            finish(name, 'ok' if result is not None else 'unavailable', result)
+
+    return _fuse(engine_results)
+
+
+def _weighted_confidence(answered):
+    total = sum(AI_DETECTOR_WEIGHTS.get(name, 1.0) for name in answered)
+    return sum(AI_DETECTOR_WEIGHTS.get(name, 1.0) * min(max(confidence, 0.0), 1.0)
+               for name, confidence in answered.items()) / total
+
+
+def _is_decisive(engine_results, running):
+    """True if the fused confidence stays decisive whatever the running engines return"""
+    answered = {name: r['confidence'] for name, r in engine_results.items() if r['status'] == 'ok'}
+    if not answered:
+        return False
+    # Engines reporting 0 can only lower the weighted mean and 1 only raise it,
+    # and dropping out leaves it where it is, so these are its bounds
+    low = _weighted_confidence(dict(answered, **{name: 0.0 for name in running}))
+    high = _weighted_confidence(dict(answered, **{name: 1.0 for name in running}))
+    return low >= AI_DETECTION_DECISIVE or high <= 1 - AI_DETECTION_DECISIVE
+
+
+def _fuse(engine_results):
+    answered = {name: r for name, r in engine_results.items() if r['status'] == 'ok'}
+    if not answered:
+        return {
+            'is_ai_generated': False,
+            'confidence': 0.0,
+            'analysis': 'AI detection unavailable',
+            'engines': engine_results
+        }
+    confidence = round(_weighted_confidence({name: r['confidence'] for name, r in answered.items()}), 2)
+    # The explanation comes from the most trusted engine that answered
+    lead = max(answered, key=lambda name: AI_DETECTOR_WEIGHTS.get(name, 1.0))
+    analysis = answered[lead]['analysis']
+    if len(answered) > 1:
+        scores = ', '.join(f"{name} {r['confidence']:.2f}" for name, r in answered.items())
+        analysis = f"{analysis} [Ensemble {confidence:.2f}: {scores}]"
+    return {
+        'is_ai_generated': confidence > 0.5,
+        'confidence': confidence,
+        'analysis': analysis,
+        'engines': engine_results
+    }
+
+
+def detect_ai_content_many(texts):
+    """Run detect_ai_content over several texts concurrently (bounded by the Groq slots)"""
+    if len(texts) <= 1:
+        return [detect_ai_content(text) for text in texts]
+    timing = request_timing()
+
+    def detect(text):
+        # Each thread gets its own dict; they are added to the request's below
+        own_timing = {'external': {}}
+        return detect_ai_content(text, own_timing), own_timing
+
+    with ThreadPoolExecutor(max_workers=min(len(texts), GROQ_MAX_CONCURRENCY)) as pool:
+        outcomes = list(pool.map(detect, texts))
+    for _, own_timing in outcomes:
+        for name, (calls, seconds) in own_timing['external'].items():
+            record_external(timing, name, seconds, calls)
+    return [result for result, _ in outcomes]
+
+
+def _groq_detection(text, api_key):
+    started = time.perf_counter()
     try:
         # Use Groq to analyze the text (using free llama model)
-        client = Groq(api_key=api_key)
+        client = get_groq_client(api_key)
         
         response = client.chat.completions.create(
             model="llama-3.1-8b-instant",  # Free and fast model
@@ -73,6 +275,8 @@ Respond ONLY with valid JSON:
             max_tokens=200
         )
         
+        GROQ_REQUESTS.labels(outcome='ok').inc()
+        DETECTION_LATENCY.labels(engine='groq').observe(time.perf_counter() - started)
         result_text = response.choices[0].message.content.strip()
         
         # Try to extract JSON if wrapped in markdown code blocks
@@ -84,9 +288,15 @@ Respond ONLY with valid JSON:
         # Parse the response
         try:
             result = json.loads(result_text)
+            is_ai = bool(result.get('is_ai_generated', False))
+            confidence = float(result.get('confidence', 0.5))
+            if not is_ai and confidence > 0.5:
+                # The model reports how sure it is of a human verdict; the
+                # ensemble fuses the probability of AI instead
+                confidence = 1 - confidence
             return {
-                'is_ai_generated': bool(result.get('is_ai_generated', False)),
-                'confidence': float(result.get('confidence', 0.5)),
+                'is_ai_generated': is_ai,
+                'confidence': round(confidence, 2),
                 'analysis': result.get('reasoning', 'AI analysis completed')
             }
         except (json.JSONDecodeError, ValueError) as e:
@@ -102,6 +312,42 @@ Respond ONLY with valid JSON:
             
     except Exception as e:
         print(f"Error in AI detection: {str(e)}")
+        GROQ_REQUESTS.labels(outcome='error').inc()
+        return None
+
+
+@register_detector('groq')
+def groq_detection(text):
+    """Groq engine; None without an API key or when every Groq slot stays busy"""
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key or api_key == 'your-groq-api-key-here':
+        return None
+    
+    slots = _groq_slots()
+    if not slots.acquire(timeout=GROQ_QUEUE_TIMEOUT):
+        # Every slot is busy: let the other engines answer rather than queue behind Groq
+        GROQ_REQUESTS.labels(outcome='saturated').inc()
+        return None
+    try:
+        return _groq_detection(text, api_key)
+    finally:
+        slots.release()
+
+
+@register_detector('ngram', local=True)
+def ngram_detection(text):
+    """Offline n-gram engine; None until a model has been trained"""
+    model = get_ngram_model()
+    if model is None:
+        return None
+    with DETECTION_LATENCY.labels(engine='ngram').time():
+        return model.detect(text)
+
+
+@register_detector('pattern', local=True)
+def timed_pattern_detection(text):
+    """Run the pattern fallback and record its latency"""
+    with DETECTION_LATENCY.labels(engine='pattern').time():
         return pattern_based_detection(text)
 
 
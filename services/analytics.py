@@ -0,0 +1,235 @@
+"""
+Incrementally maintained exam analytics.
+
+Each submission adds its contribution to the summary tables in models.py
+(running sums, score buckets, option counts) inside the submit transaction,
+and each reported violation bumps its type's counter. Reading the analytics
+for an exam therefore costs a handful of small queries regardless of how many
+sessions it has. rebuild_exam_analytics() recomputes the tables from scratch
+for backfills or after manual data fixes. Increments hold a shared lock on
+the exam row and rebuilds an exclusive one, so a submit landing mid-rebuild
+is counted exactly once.
+"""
+import math
+from collections import defaultdict
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from models import (
+    db, Exam, Question, ExamSession, Answer, ProctoringViolation,
+    ExamAnalytics, ExamScoreBucket, QuestionAnalytics, QuestionOptionCount, ViolationCount
+)
+
+SUBMITTED_STATUSES = ('completed', 'flagged')
+SUMMARY_MODELS = (ExamAnalytics, ExamScoreBucket, QuestionAnalytics, QuestionOptionCount, ViolationCount)
+
+
+def record_submission(session):
+    """
+    Add a just-scored session to its exam's analytics (caller commits). Call
+    it only from the request that moved the session out of in_progress, or
+    the session is counted twice.
+    """
+    passing_score = _lock_exam(session.exam_id, shared=True)
+    for model, keys, deltas, extra in _submission_deltas(session, passing_score):
+        _increment(model, keys, deltas, extra)
+
+
+def record_violation(exam_id, violation_type):
+    """Count one reported violation (caller commits)"""
+    _lock_exam(exam_id, shared=True)
+    _increment(ViolationCount, {'exam_id': exam_id, 'violation_type': violation_type or 'unknown'},
+               {'count': 1})
+
+
+def rebuild_exam_analytics(exam_id):
+    """Recompute an exam's summary rows from its sessions, answers and violations"""
+    passing_score = _lock_exam(exam_id, shared=False)
+    delete_exam_analytics(exam_id)
+
+    totals = {}
+    sessions = db.session.scalars(
+        select(ExamSession)
+        .where(ExamSession.exam_id == exam_id, ExamSession.status.in_(SUBMITTED_STATUSES))
+        .options(selectinload(ExamSession.answers).selectinload(Answer.question))
+        .execution_options(yield_per=500)
+    )
+    for session in sessions:
+        for model, keys, deltas, extra in _submission_deltas(session, passing_score):
+            key = (model, tuple(sorted(keys.items())))
+            row = totals.setdefault(key, {**keys, **extra, **{column: 0 for column in deltas}})
+            for column, delta in deltas.items():
+                row[column] += delta
+
+    rows_by_model = defaultdict(list)
+    for (model, _), row in totals.items():
+        rows_by_model[model].append(row)
+
+    violation_rows = db.session.execute(
+        select(ProctoringViolation.violation_type, db.func.count())
+        .join(ExamSession, ExamSession.id == ProctoringViolation.session_id)
+        .where(ExamSession.exam_id == exam_id)
+        .group_by(ProctoringViolation.violation_type)
+    ).all()
+    violation_counts = defaultdict(int)
+    for violation_type, count in violation_rows:
+        violation_counts[violation_type or 'unknown'] += count
+    rows_by_model[ViolationCount] = [{'exam_id': exam_id, 'violation_type': violation_type, 'count': count}
+                                     for violation_type, count in violation_counts.items()]
+
+    for model in SUMMARY_MODELS:
+        if rows_by_model[model]:
+            db.session.execute(insert(model), rows_by_model[model])
+
+
+def delete_exam_analytics(exam_id):
+    for model in SUMMARY_MODELS:
+        db.session.execute(
+            delete(model).where(model.exam_id == exam_id),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def delete_question_analytics(question_id):
+    for model in (QuestionAnalytics, QuestionOptionCount):
+        db.session.execute(
+            delete(model).where(model.question_id == question_id),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def exam_analytics(exam):
+    """Build the analytics payload for an exam from its summary rows"""
+    summary = db.session.get(ExamAnalytics, exam.id)
+    submitted = summary.sessions_submitted if summary else 0
+
+    buckets = dict(db.session.execute(
+        select(ExamScoreBucket.bucket, ExamScoreBucket.count).where(ExamScoreBucket.exam_id == exam.id)
+    ).all())
+    histogram = [0] * 10
+    for bucket, count in buckets.items():
+        histogram[min(bucket // 10, 9)] += count
+    passed = summary.passed_count if summary else 0
+
+    mean = std = None
+    if submitted:
+        mean = summary.percentage_sum / submitted
+        std = math.sqrt(max(summary.percentage_sq_sum / submitted - mean * mean, 0.0))
+
+    options = defaultdict(dict)
+    for question_id, option, count in db.session.execute(
+        select(QuestionOptionCount.question_id, QuestionOptionCount.option, QuestionOptionCount.count)
+        .where(QuestionOptionCount.exam_id == exam.id)
+    ):
+        options[question_id][option] = count
+
+    questions = []
+    for question, stats in db.session.execute(
+        select(Question, QuestionAnalytics)
+        .outerjoin(QuestionAnalytics, QuestionAnalytics.question_id == Question.id)
+        .where(Question.exam_id == exam.id)
+        .order_by(Question.order)
+    ):
+        attempts = stats.attempts if stats else 0
+        entry = {
+            'question_id': question.id,
+            'order': question.order,
+            'question_type': question.question_type,
+            'attempts': attempts,
+            'p_value': round(stats.sum_x / attempts, 4) if attempts else None,
+            'discrimination': _discrimination(stats) if stats else None
+        }
+        if question.question_type == 'mcq':
+            entry['correct_answer'] = question.correct_answer
+            entry['option_counts'] = options.get(question.id, {})
+        questions.append(entry)
+
+    violations = dict(db.session.execute(
+        select(ViolationCount.violation_type, ViolationCount.count).where(ViolationCount.exam_id == exam.id)
+    ).all())
+
+    return {
+        'exam_id': exam.id,
+        'passing_score': exam.passing_score,
+        'sessions_submitted': submitted,
+        'flagged_count': summary.flagged_count if summary else 0,
+        'passed_count': passed,
+        'pass_rate': round(passed / submitted, 4) if submitted else None,
+        'mean_percentage': round(mean, 2) if mean is not None else None,
+        'std_percentage': round(std, 2) if std is not None else None,
+        'score_histogram': [{'range': f'{i * 10}-{i * 10 + 9 if i < 9 else 100}', 'count': count}
+                            for i, count in enumerate(histogram)],
+        'questions': questions,
+        'violations': violations
+    }
+
+
+def _lock_exam(exam_id, shared):
+    """Lock the exam row until commit and return its passing score, read under the lock"""
+    return db.session.scalar(
+        select(Exam.passing_score).where(Exam.id == exam_id).with_for_update(read=shared)
+    )
+
+
+def _submission_deltas(session, passing_score):
+    """Yield (model, keys, deltas, insert-only columns) for one submitted session"""
+    percentage = session.percentage or 0.0
+    y = percentage / 100
+    # Same rule as the candidate's results page; exact, unlike the whole-point buckets
+    passed = bool(session.percentage) and session.percentage >= (passing_score or 0)
+
+    yield ExamAnalytics, {'exam_id': session.exam_id}, {
+        'sessions_submitted': 1,
+        'flagged_count': 1 if session.status == 'flagged' else 0,
+        'passed_count': 1 if passed else 0,
+        'percentage_sum': percentage,
+        'percentage_sq_sum': percentage * percentage
+    }, {}
+    yield ExamScoreBucket, {'exam_id': session.exam_id, 'bucket': min(int(percentage), 100)}, {'count': 1}, {}
+
+    # Sorted so concurrent submits touch rows in the same order
+    for answer in sorted(session.answers, key=lambda a: a.question_id):
+        question = answer.question
+        if answer.score is None:
+            continue  # ungraded open-ended answer
+        x = answer.score / question.points if question.points else 0.0
+        yield QuestionAnalytics, {'question_id': question.id}, {
+            'attempts': 1, 'sum_x': x, 'sum_x2': x * x, 'sum_y': y, 'sum_y2': y * y, 'sum_xy': x * y
+        }, {'exam_id': session.exam_id}
+        if question.question_type == 'mcq' and answer.selected_option:
+            yield QuestionOptionCount, {'question_id': question.id, 'option': answer.selected_option[:10]}, \
+                {'count': 1}, {'exam_id': session.exam_id}
+
+
+def _increment(model, keys, deltas, extra=None):
+    """Add deltas to a summary row, creating it on first use"""
+    where = [getattr(model, column) == value for column, value in keys.items()]
+    values = {column: getattr(model, column) + delta for column, delta in deltas.items()}
+    result = db.session.execute(
+        update(model).where(*where).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model).values(**keys, **(extra or {}), **deltas))
+    except IntegrityError:
+        # Another transaction created the row first
+        db.session.execute(
+            update(model).where(*where).values(**values),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def _discrimination(stats):
+    """Item-total (point-biserial) correlation between item score and exam percentage"""
+    n = stats.attempts
+    if n < 2:
+        return None
+    covariance = n * stats.sum_xy - stats.sum_x * stats.sum_y
+    variance_x = n * stats.sum_x2 - stats.sum_x ** 2
+    variance_y = n * stats.sum_y2 - stats.sum_y ** 2
+    if variance_x <= 1e-12 or variance_y <= 1e-12:
+        return None
+    return round(covariance / math.sqrt(variance_x * variance_y), 4)
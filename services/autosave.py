@@ -0,0 +1,41 @@
+# What static/exam.html sends; pasting is blocked there, so there is no paste counter
+TYPING_COUNTERS = ('keystrokes', 'deletions', 'active_ms', 'idle_ms')
+
+
+def apply_diff(text, diff):
+    """
+    Apply a {'start', 'delete', 'insert'} splice to text.
+    Raises TypeError for a malformed splice and ValueError if it does not fit the text.
+    """
+    if not isinstance(diff, dict):
+        raise TypeError('diff must be an object')
+    start, delete = diff.get('start', 0), diff.get('delete', 0)
+    insert = diff.get('insert') or ''
+    if not isinstance(start, int) or not isinstance(delete, int):
+        raise TypeError('start and delete must be integers')
+    if not isinstance(insert, str):
+        raise TypeError('insert must be a string')
+
+    if start < 0 or delete < 0 or start + delete > len(text):
+        raise ValueError('Diff does not match the current draft')
+    return text[:start] + insert + text[start + delete:]
+
+
+def merge_typing_stats(current, update):
+    """Accumulate client keystroke counters; keep the largest burst seen"""
+    stats = dict(current or {})
+    if not isinstance(update, dict):
+        return stats
+
+    for key in TYPING_COUNTERS:
+        value = update.get(key)
+        if isinstance(value, (int, float)) and value >= 0:
+            stats[key] = stats.get(key, 0) + value
+
+    burst = update.get('max_insert_burst')
+    if isinstance(burst, (int, float)) and burst > stats.get('max_insert_burst', 0):
+        stats['max_insert_burst'] = burst
+
+    if stats.get('active_ms') and stats.get('keystrokes'):
+        stats['ms_per_keystroke'] = round(stats['active_ms'] / stats['keystrokes'], 1)
+    return stats
@@ -0,0 +1,94 @@
+import csv
+import io
+from itertools import islice
+from sqlalchemy import func, insert, select
+from models import db, User
+
+REQUIRED_FIELDS = ['email', 'full_name']
+OPTIONAL_FIELDS = [
+    'phone', 'position_applied', 'qualification', 'experience_years',
+    'current_organization', 'linkedin_url', 'portfolio_url'
+]
+BATCH_SIZE = 1000
+
+
+def _clean_row(raw, line, exam_id):
+    """Normalize one CSV row. Returns (row, error)"""
+    row = {k.strip().lower(): (v or '').strip() for k, v in raw.items() if k}
+
+    missing = [f for f in REQUIRED_FIELDS if not row.get(f)]
+    if missing:
+        return None, {'line': line, 'email': row.get('email'), 'error': f"Missing {', '.join(missing)}"}
+
+    email = row['email'].lower()
+    if '@' not in email:
+        return None, {'line': line, 'email': row['email'], 'error': 'Invalid email'}
+
+    values = {
+        'email': email,
+        'full_name': row['full_name'],
+        'is_admin': False,
+        'assigned_exam_id': exam_id
+    }
+    for field in OPTIONAL_FIELDS:
+        values[field] = row.get(field) or None
+
+    if values['experience_years'] is not None:
+        try:
+            values['experience_years'] = int(values['experience_years'])
+        except ValueError:
+            return None, {'line': line, 'email': email, 'error': 'experience_years must be an integer'}
+
+    return values, None
+
+
+def import_candidates(stream, exam_id=None, batch_size=BATCH_SIZE):
+    """
+    Stream a candidate CSV into the users table.
+    Rows are processed in batches: each batch is deduplicated against the
+    database with one IN query and written with one bulk insert. Bad rows are
+    reported and skipped without aborting the import.
+    """
+    if isinstance(stream, (bytes, str)):
+        stream = io.BytesIO(stream.encode() if isinstance(stream, str) else stream)
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+
+    created = 0
+    errors = []
+    seen = set()
+    line = 1  # header
+
+    while True:
+        batch = list(islice(reader, batch_size))
+        if not batch:
+            break
+
+        rows = {}
+        for raw in batch:
+            line += 1
+            values, error = _clean_row(raw, line, exam_id)
+            if error:
+                errors.append(error)
+            elif values['email'] in seen:
+                errors.append({'line': line, 'email': values['email'], 'error': 'Duplicate email in file'})
+            else:
+                seen.add(values['email'])
+                rows[values['email']] = (line, values)
+
+        if not rows:
+            continue
+
+        existing = set(db.session.scalars(
+            select(func.lower(User.email)).where(func.lower(User.email).in_(list(rows)))
+        ))
+        for email in existing:
+            existing_line, _ = rows.pop(email)
+            errors.append({'line': existing_line, 'email': email, 'error': 'Email already registered'})
+
+        if rows:
+            db.session.execute(insert(User), [values for _, values in rows.values()])
+            db.session.commit()
+            created += len(rows)
+
+    errors.sort(key=lambda e: e['line'])
+    return created, errors
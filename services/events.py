@@ -0,0 +1,146 @@
+import json
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Event types published to the admin monitoring feed
+SESSION_STARTED = 'session_started'
+ANSWER_SAVED = 'answer_saved'
+VIOLATION_RECORDED = 'violation_recorded'
+SESSION_SUBMITTED = 'session_submitted'
+SESSION_FLAGGED = 'session_flagged'
+
+NOTIFY_CHANNEL = 'exam_events'
+
+
+class LocalBroker:
+    """In-process pub/sub: every subscriber gets a bounded queue"""
+
+    def __init__(self, queue_size=1000):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # Slow consumer; drop rather than block the request that published
+                pass
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Fans events out across gunicorn workers with LISTEN/NOTIFY.
+    publish() sends pg_notify; a listener thread per worker receives every
+    notification and dispatches it to that worker's local subscribers.
+    """
+
+    def __init__(self, database_uri, queue_size=1000):
+        super().__init__(queue_size)
+        self.database_uri = database_uri
+        self._listener = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.database_uri)
+        conn.autocommit = True
+        return conn
+
+    def subscribe(self):
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                    self._listener.start()
+        return super().subscribe()
+
+    def publish(self, event):
+        payload = json.dumps(event)
+        with self._publish_lock:
+            try:
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = self._connect()
+                with self._publish_conn.cursor() as cursor:
+                    cursor.execute('SELECT pg_notify(%s, %s)', (NOTIFY_CHANNEL, payload))
+            except Exception as e:
+                print(f"Error publishing event: {str(e)}")
+                self._publish_conn = None
+                # Still deliver to this worker's subscribers
+                self.dispatch(event)
+
+    def _listen(self):
+        import select
+        while True:
+            try:
+                conn = self._connect()
+                with conn.cursor() as cursor:
+                    cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        try:
+                            self.dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            pass
+            except Exception as e:
+                print(f"Event listener error, reconnecting: {str(e)}")
+                time.sleep(2)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def init_app(app):
+    """Pick the broker from EVENT_BROKER ('local' or 'postgres')"""
+    global _broker
+    with _broker_lock:
+        if app.config.get('EVENT_BROKER') == 'postgres':
+            _broker = PostgresBroker(app.config['SQLALCHEMY_DATABASE_URI'])
+        else:
+            _broker = LocalBroker()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = LocalBroker()
+    return _broker
+
+
+def publish(event_type, **data):
+    """Publish a monitoring event; never raises into the calling request"""
+    event = {'type': event_type, 'timestamp': datetime.utcnow().isoformat(), **data}
+    try:
+        get_broker().publish(event)
+    except Exception as e:
+        print(f"Error publishing event: {str(e)}")
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
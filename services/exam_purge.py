@@ -0,0 +1,87 @@
+import threading
+from sqlalchemy import delete, select, update
+from services.analytics import delete_exam_analytics
+from models import db, Exam, Question, ExamSession, Answer, AnswerDraft, TypingEventBatch, ProctoringViolation, User
+
+PURGE_CHUNK_SIZE = 500
+
+
+def delete_exam_rows(exam_id):
+    """Delete an exam and everything hanging off it with set-based statements"""
+    session_ids = select(ExamSession.id).where(ExamSession.exam_id == exam_id)
+    _delete_sessions(session_ids)
+    db.session.execute(
+        delete(ExamSession).where(ExamSession.exam_id == exam_id),
+        execution_options={'synchronize_session': False}
+    )
+    _delete_exam_shell(exam_id)
+
+
+def purge_exam(exam_id, chunk_size=PURGE_CHUNK_SIZE):
+    """
+    Delete an archived exam in chunks of sessions, committing after each
+    chunk so no single transaction holds locks for long.
+    """
+    while True:
+        session_ids = list(db.session.scalars(
+            select(ExamSession.id).where(ExamSession.exam_id == exam_id).limit(chunk_size)
+        ))
+        if not session_ids:
+            break
+        _delete_sessions(session_ids)
+        db.session.execute(
+            delete(ExamSession).where(ExamSession.id.in_(session_ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+
+    _delete_exam_shell(exam_id)
+    db.session.commit()
+
+
+def start_purge(app, exam_id):
+    """Purge an archived exam on a background thread"""
+    def run():
+        with app.app_context():
+            try:
+                purge_exam(exam_id)
+                print(f"Purged archived exam {exam_id}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error purging exam {exam_id}: {str(e)}")
+
+    thread = threading.Thread(target=run, name=f'purge-exam-{exam_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def purge_archived_exams():
+    """Purge every archived exam; used to resume purges interrupted by a restart"""
+    exam_ids = list(db.session.scalars(select(Exam.id).where(Exam.deleted_at.isnot(None))))
+    for exam_id in exam_ids:
+        purge_exam(exam_id)
+    return exam_ids
+
+
+def _delete_sessions(session_ids):
+    for model in (ProctoringViolation, Answer, AnswerDraft, TypingEventBatch):
+        db.session.execute(
+            delete(model).where(model.session_id.in_(session_ids)),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def _delete_exam_shell(exam_id):
+    delete_exam_analytics(exam_id)
+    db.session.execute(
+        update(User).where(User.assigned_exam_id == exam_id).values(assigned_exam_id=None),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(Question).where(Question.exam_id == exam_id),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(
+        delete(Exam).where(Exam.id == exam_id),
+        execution_options={'synchronize_session': False}
+    )
@@ -0,0 +1,467 @@
+"""
+Winnowed fingerprint corpus of every submitted open-ended answer.
+
+Answers are normalised (lowercase, letters and digits only), hashed as
+overlapping KGRAM_CHARS-character grams and winnowed: the rightmost smallest
+hash of every WINNOW_WINDOW consecutive grams is kept. Two texts sharing a
+passage of KGRAM_CHARS + WINNOW_WINDOW - 1 normalised characters are
+guaranteed to share a fingerprint.
+
+The corpus lives in FINGERPRINT_DIR, outside the database, so answers from
+purged exams and earlier recruitment cycles keep matching:
+
+- pending.fp / pending.meta: append-only logs of new submissions
+- seg-<n>.fp: uint64 rows [hash, answer_id] sorted by hash
+- seg-<n>.meta: int64 rows [answer_id, exam_id, candidate_id, submitted_at,
+  fingerprints] sorted by answer_id
+- MANIFEST: live segment names, replaced atomically
+
+Segments are memory-mapped and binary-searched, so a query costs
+O(fingerprints * log corpus) plus a scan of the pending log, which is sorted
+into a segment once it holds SEAL_RECORDS fingerprints. Submits only append
+(and now and then seal). Past COMPACT_SEGMENTS segments, a background thread
+merges the newest segments of similar size, up to MAX_MERGE_RECORDS, so big
+segments are not rewritten on every cycle; `flask compact-fingerprints`
+merges everything. Merges build the new segment without holding the writer
+lock and only take it to swap the manifest. Writers take an flock, so
+gunicorn workers on one host share a corpus; it is not shared between hosts.
+"""
+import calendar
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows; keep one writer process there
+    fcntl = None
+
+KGRAM_CHARS = 30
+WINNOW_WINDOW = 20
+HASH_BASE = 1000003
+SEAL_RECORDS = 64 * 1024
+COMPACT_SEGMENTS = 8
+MAX_MERGE_RECORDS = 4 * 1024 * 1024  # background merges stay under ~64 MB
+MIN_SHARED_FINGERPRINTS = 3
+META_FIELDS = ('answer_id', 'exam_id', 'candidate_id', 'submitted_at', 'fingerprints')
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def winnow(text, k=KGRAM_CHARS, window=WINNOW_WINDOW):
+    """Sorted unique fingerprint hashes (uint64) of a text"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    normalized = _NON_WORD.sub('', (text or '').lower())
+    if len(normalized) < k:
+        return np.zeros(0, dtype=np.uint64)
+
+    # Polynomial k-gram hashes; uint64 arithmetic wraps, i.e. works mod 2**64
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    powers = np.ones(k, dtype=np.uint64)
+    powers[1:] = np.cumprod(np.full(k - 1, HASH_BASE, dtype=np.uint64))
+    hashes = sliding_window_view(codes, k) @ powers[::-1]
+    # Mix the bits so winnowing's minimum is not biased toward low characters
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xff51afd7ed558ccd)
+    hashes ^= hashes >> np.uint64(33)
+
+    if len(hashes) <= window:
+        return np.unique(hashes.min(keepdims=True))
+    windows = sliding_window_view(hashes, window)
+    picks = np.arange(len(windows)) + (window - 1 - np.argmin(windows[:, ::-1], axis=1))
+    return np.unique(hashes[picks])
+
+
+class FingerprintStore:
+    """Append-only fingerprint segments in one directory"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._manifest_key = None
+        self._segments = []
+        self._merging = False
+
+    def _path(self, name):
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _writer(self):
+        with self._lock:
+            while True:
+                lock_file = open(self._path('LOCK'), 'a')
+                if fcntl is None:
+                    break
+                # Poll rather than block, so a gevent worker keeps serving while it waits
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        time.sleep(0.005)
+                # A rebuild may have swapped the directory while we waited
+                if os.path.exists(self._path('LOCK')) and \
+                        os.fstat(lock_file.fileno()).st_ino == os.stat(self._path('LOCK')).st_ino:
+                    break
+                lock_file.close()
+            try:
+                yield
+            finally:
+                lock_file.close()
+
+    def add(self, entries):
+        """Index (answer_id, exam_id, candidate_id, submitted_at, text) tuples; returns fingerprints added"""
+        import numpy as np
+        pairs, meta = [], []
+        for answer_id, exam_id, candidate_id, submitted_at, text in entries:
+            hashes = winnow(text)
+            if not len(hashes):
+                continue
+            pairs.append(np.stack([hashes, np.full(len(hashes), answer_id, dtype=np.uint64)], axis=1))
+            meta.append((answer_id, exam_id or 0, candidate_id or 0, _epoch(submitted_at), len(hashes)))
+        if not pairs:
+            return 0
+        pairs = np.concatenate(pairs)
+        with self._writer():
+            sealed = self._append(pairs, np.array(meta, dtype=np.int64))
+        if sealed and len(self._read_manifest()['segments']) > COMPACT_SEGMENTS:
+            self._start_background_merge()
+        return len(pairs)
+
+    def _append(self, pairs, meta):
+        """Write to the pending logs (writer lock held), sealing them when full; returns whether it sealed"""
+        with open(self._path('pending.fp'), 'ab') as f:
+            f.write(pairs.astype('<u8').tobytes())
+        with open(self._path('pending.meta'), 'ab') as f:
+            f.write(meta.astype('<i8').tobytes())
+        if os.path.getsize(self._path('pending.fp')) >= SEAL_RECORDS * 16:
+            self._seal()
+            return True
+        return False
+
+    def _seal(self):
+        import numpy as np
+        pairs = self._read_log('pending.fp', 2, np.uint64)
+        meta = self._read_log('pending.meta', len(META_FIELDS), np.int64)
+        if len(pairs):
+            manifest = self._read_manifest()
+            name = f"seg-{manifest['next']:06d}"
+            self._write_segment(name, pairs, meta)
+            manifest['segments'].append(name)
+            manifest['next'] += 1
+            self._write_manifest(manifest)
+        # A crash before truncating leaves duplicates, which queries ignore
+        for log in ('pending.fp', 'pending.meta'):
+            open(self._path(log), 'wb').close()
+
+    def compact(self):
+        """Seal the pending logs and merge every segment into one"""
+        with self._writer():
+            self._seal()
+            names = self._read_manifest()['segments']
+        return self._merge(names)
+
+    def _start_background_merge(self):
+        with self._lock:
+            if self._merging:
+                return
+            self._merging = True
+
+        def run():
+            try:
+                self._merge(self._tiered_merge_names())
+            except Exception as e:
+                print(f"Error merging fingerprint segments: {str(e)}")
+            finally:
+                self._merging = False
+
+        threading.Thread(target=run, name='fingerprint-merge', daemon=True).start()
+
+    def _tiered_merge_names(self):
+        """The newest segments of similar size, up to MAX_MERGE_RECORDS in total"""
+        names = self._read_manifest()['segments']
+        chosen, total = [], 0
+        for name in reversed(names):
+            try:
+                size = os.path.getsize(self._path(name + '.fp')) // 16
+            except FileNotFoundError:
+                return []  # another worker is merging
+            # An older segment joins only if it is not much bigger than what it would merge with
+            if chosen and (size > 2 * total or total + size > MAX_MERGE_RECORDS):
+                break
+            chosen.append(name)
+            total += size
+        return chosen[::-1]
+
+    def _merge(self, names):
+        """Replace consecutive segments with one; returns False if another merge got there first"""
+        import numpy as np
+        if len(names) <= 1:
+            return False
+        with self._writer():
+            manifest = self._read_manifest()
+            name = f"seg-{manifest['next']:06d}"
+            manifest['next'] += 1
+            self._write_manifest(manifest)
+
+        # Segments are immutable, so the heavy part runs without the lock
+        try:
+            pairs = np.concatenate([self._load(n + '.fp', 2).T for n in names])
+            meta = np.concatenate([self._load(n + '.meta', len(META_FIELDS)).T for n in names])
+        except FileNotFoundError:
+            return False  # another worker merged them already
+        self._write_segment(name, pairs, meta, runs_sorted=True)
+
+        with self._writer():
+            manifest = self._read_manifest()
+            segments = manifest['segments']
+            start = segments.index(names[0]) if names[0] in segments else -1
+            if start < 0 or segments[start:start + len(names)] != names:
+                replaced = [name]
+            else:
+                manifest['segments'] = segments[:start] + [name] + segments[start + len(names):]
+                self._write_manifest(manifest)
+                replaced = names
+        # Readers that still map the old files keep them until they refresh
+        for old_name in replaced:
+            for suffix in ('.fp', '.meta'):
+                os.remove(self._path(old_name + suffix))
+        return replaced is names
+
+    def _write_segment(self, name, pairs, meta, runs_sorted=False):
+        import numpy as np
+        if runs_sorted:
+            # Concatenated sorted segments: a stable sort merges the runs cheaply
+            pairs = pairs[np.argsort(pairs[:, 0], kind='stable')]
+        else:
+            pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        if len(pairs):
+            pairs = pairs[np.concatenate(([True], (pairs[1:] != pairs[:-1]).any(axis=1)))]
+        # Keep the newest metadata per answer
+        meta = meta[::-1]
+        _, first = np.unique(meta[:, 0], return_index=True)
+        meta = meta[first]
+        self._write_file(name + '.fp', np.ascontiguousarray(pairs.T, dtype='<u8'))
+        self._write_file(name + '.meta', np.ascontiguousarray(meta.T, dtype='<i8'))
+
+    def _write_file(self, name, array):
+        tmp_path = self._path(name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(name))
+
+    def _read_manifest(self):
+        try:
+            with open(self._path('MANIFEST')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'segments': [], 'next': 0}
+
+    def _write_manifest(self, manifest):
+        tmp_path = self._path('MANIFEST.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._path('MANIFEST'))
+
+    def _read_log(self, name, width, dtype):
+        import numpy as np
+        try:
+            data = np.fromfile(self._path(name), dtype=np.dtype(dtype).newbyteorder('<'))
+        except FileNotFoundError:
+            return np.zeros((0, width), dtype=dtype)
+        # A concurrent append may be half written
+        return data[:len(data) // width * width].reshape(-1, width).astype(dtype)
+
+    def _load(self, name, rows):
+        """Memory-map a segment file as `rows` contiguous columns"""
+        import numpy as np
+        dtype = '<u8' if name.endswith('.fp') else '<i8'
+        data = np.memmap(self._path(name), dtype=dtype, mode='r')
+        return data.reshape(rows, -1)
+
+    def _live_segments(self):
+        """Mapped (pairs, meta) per segment, reloaded when the manifest changes"""
+        for _ in range(3):
+            try:
+                stat = os.stat(self._path('MANIFEST'))
+                key = (stat.st_ino, stat.st_mtime_ns)
+            except FileNotFoundError:
+                return []
+            if key == self._manifest_key:
+                return self._segments
+            try:
+                names = self._read_manifest()['segments']
+                self._segments = [(self._load(name + '.fp', 2), self._load(name + '.meta', len(META_FIELDS)))
+                                  for name in names]
+                self._manifest_key = key
+                return self._segments
+            except FileNotFoundError:
+                continue  # compacted while we read; try the new manifest
+        return self._segments
+
+    def query(self, hashes, exclude_candidate=None, exclude_answers=(), limit=10):
+        """Historical answers sharing at least MIN_SHARED_FINGERPRINTS of `hashes`"""
+        import numpy as np
+        if not len(hashes):
+            return []
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        segments = self._live_segments()
+        pending = self._read_log('pending.fp', 2, np.uint64)
+        pending_meta = self._read_log('pending.meta', len(META_FIELDS), np.int64)
+
+        hits = [pending[np.isin(pending[:, 0], hashes)]]
+        for pairs, _ in segments:
+            lo = np.searchsorted(pairs[0], hashes, side='left')
+            hi = np.searchsorted(pairs[0], hashes, side='right')
+            found = hi > lo
+            if found.any():
+                index = np.concatenate([np.arange(a, b) for a, b in zip(lo[found], hi[found])])
+                hits.append(pairs[:, index].T)
+        hits = np.unique(np.concatenate(hits), axis=0)
+        if not len(hits):
+            return []
+
+        answer_ids, shared = np.unique(hits[:, 1].astype(np.int64), return_counts=True)
+        keep = (shared >= MIN_SHARED_FINGERPRINTS) & ~np.isin(answer_ids, list(exclude_answers))
+        answer_ids, shared = answer_ids[keep], shared[keep]
+
+        meta = {}
+        for _, segment_meta in segments:
+            pos = np.minimum(np.searchsorted(segment_meta[0], answer_ids), segment_meta.shape[1] - 1)
+            for column in np.flatnonzero(segment_meta[0][pos] == answer_ids):
+                meta[int(answer_ids[column])] = segment_meta[:, pos[column]]
+        for row in pending_meta[np.isin(pending_meta[:, 0], answer_ids)]:
+            meta[int(row[0])] = row
+
+        matches = []
+        for answer_id, count in zip(answer_ids.tolist(), shared.tolist()):
+            row = meta.get(answer_id)
+            if row is None or (exclude_candidate is not None and int(row[2]) == exclude_candidate):
+                continue
+            matches.append({
+                'answer_id': answer_id,
+                'exam_id': int(row[1]) or None,
+                'candidate_id': int(row[2]) or None,
+                'submitted_at': datetime.utcfromtimestamp(int(row[3])).isoformat() if row[3] else None,
+                'shared_fingerprints': count,
+                'containment': round(count / len(hashes), 3),
+                'source_coverage': round(count / max(1, int(row[4])), 3)
+            })
+        matches.sort(key=lambda m: (-m['shared_fingerprints'], m['answer_id']))
+        return matches[:limit]
+
+    def stats(self):
+        import numpy as np
+        segments = self._live_segments()
+        pending = len(self._read_log('pending.fp', 2, np.uint64))
+        pending_answers = len(self._read_log('pending.meta', len(META_FIELDS), np.int64))
+        return {
+            'segments': len(segments),
+            'fingerprints': sum(pairs.shape[1] for pairs, _ in segments) + pending,
+            'answers': sum(meta.shape[1] for _, meta in segments) + pending_answers,
+            'pending_fingerprints': pending
+        }
+
+
+def _epoch(value):
+    return calendar.timegm(value.utctimetuple()) if value else 0
+
+
+def get_fingerprint_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FingerprintStore(current_app.config['FINGERPRINT_DIR'])
+    return _store
+
+
+def _answer_rows():
+    from sqlalchemy import select
+    from models import Answer, ExamSession, Question
+    return (select(Answer.id, ExamSession.exam_id, ExamSession.candidate_id, ExamSession.submitted_at,
+                   Answer.answer_text)
+            .join(ExamSession, ExamSession.id == Answer.session_id)
+            .join(Question, Question.id == Answer.question_id)
+            .where(Question.question_type == 'open_ended', Answer.answer_text.isnot(None)))
+
+
+def index_session_answers(session_id):
+    """Add a submitted session's open-ended answers to the corpus"""
+    from models import db, Answer
+    rows = db.session.execute(_answer_rows().where(Answer.session_id == session_id)).all()
+    return get_fingerprint_store().add(rows)
+
+
+def find_similar_answers(text, exclude_candidate=None, exclude_answers=(), ignore_text=None, limit=10):
+    """Corpus answers sharing passages with `text`; fingerprints of `ignore_text` (the question) are skipped"""
+    import numpy as np
+    hashes = winnow(text)
+    if ignore_text:
+        hashes = np.setdiff1d(hashes, winnow(ignore_text), assume_unique=True)
+    return len(hashes), get_fingerprint_store().query(hashes, exclude_candidate=exclude_candidate,
+                                                      exclude_answers=exclude_answers, limit=limit)
+
+
+def rebuild_fingerprints(batch_size=1000):
+    """
+    Rebuild the corpus from the answers table, streaming rows. Answers already
+    in the old corpus but gone from the database (purged exams) are carried
+    over, as is anything submitted while the rebuild ran.
+    """
+    import numpy as np
+    from models import db, ExamSession
+    global _store
+
+    live = get_fingerprint_store()
+    building = FingerprintStore(live.root + '.rebuild')
+    shutil.rmtree(building.root, ignore_errors=True)
+    building = FingerprintStore(building.root)
+    building._merging = True  # merged once at the end instead
+
+    indexed = 0
+    result = db.session.execute(
+        _answer_rows().where(ExamSession.status != 'in_progress').order_by(ExamSession.id),
+        execution_options={'yield_per': batch_size}
+    )
+    for rows in result.partitions(batch_size):
+        indexed += len(rows)
+        building.add(rows)
+    result.close()
+    building.compact()
+
+    with live._writer():
+        rebuilt_ids = np.concatenate([meta[0] for _, meta in building._live_segments()] or [np.zeros(0, np.int64)])
+        old_pairs = [live._read_log('pending.fp', 2, np.uint64)]
+        old_meta = [live._read_log('pending.meta', len(META_FIELDS), np.int64)]
+        for pairs, meta in live._live_segments():
+            old_pairs.append(pairs.T)
+            old_meta.append(meta.T)
+        old_pairs, old_meta = np.concatenate(old_pairs), np.concatenate(old_meta)
+        carried = old_meta[~np.isin(old_meta[:, 0], rebuilt_ids)]
+        if len(carried):
+            with building._writer():
+                building._append(old_pairs[np.isin(old_pairs[:, 1].astype(np.int64), carried[:, 0])], carried)
+                building._seal()
+
+        retired = f'{live.root}.old-{int(time.time())}'
+        os.rename(live.root, retired)
+        os.rename(building.root, live.root)
+    shutil.rmtree(retired, ignore_errors=True)
+    with _store_lock:
+        _store = FingerprintStore(live.root)
+    return {'indexed_answers': indexed, 'carried_over_answers': len(carried), **_store.stats()}
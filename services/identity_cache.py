@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app, g
+from flask_jwt_extended import get_jwt_identity
+from models import db, User
+
+CachedIdentity = namedtuple('CachedIdentity', ['id', 'email', 'full_name', 'is_admin', 'assigned_exam_id'])
+
+_MISSING = object()
+
+
+class IdentityCache:
+    """
+    Small per-process TTL cache of user identity rows.
+    Role changes and assignments made in this process invalidate entries
+    immediately; changes made by other workers become visible after the TTL.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, ttl):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.execute(
+            db.select(User.id, User.email, User.full_name, User.is_admin, User.assigned_exam_id)
+            .where(User.id == user_id)
+        ).first()
+        identity = CachedIdentity(*row) if row else None
+
+        with self._lock:
+            self._entries[user_id] = (now + ttl, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id=None):
+        """Drop one user, or everything when user_id is None"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+identity_cache = IdentityCache()
+
+
+def current_identity():
+    """Identity of the JWT holder, cached for the request and across requests"""
+    identity = g.get('_identity', _MISSING)
+    if identity is _MISSING:
+        ttl = current_app.config.get('IDENTITY_CACHE_TTL', 30)
+        identity = identity_cache.get(int(get_jwt_identity()), ttl)
+        g._identity = identity
+    return identity
+
+
+def invalidate_identity(user_id=None):
+    identity_cache.invalidate(user_id)
+    g.pop('_identity', None)
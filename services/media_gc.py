@@ -0,0 +1,160 @@
+"""
+Garbage collection for proctoring media.
+
+One pass over the storage backend, a batch of objects at a time:
+
+- orphaned: the object names a session that no longer exists (deleted exam)
+- expired: the session ended more than its exam's media_retention_days ago
+  (MEDIA_RETENTION_DAYS when the exam does not set one; 0 keeps media forever)
+- quota: when the remaining media exceed MEDIA_QUOTA_BYTES, the oldest
+  objects are evicted until it fits
+
+Rows pointing at removed files are cleared so the admin UI does not offer
+broken links. Objects whose names are not recognised are never deleted,
+except abandoned partial uploads.
+"""
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from models import db, Exam, ExamSession, ProctoringViolation
+from services.storage import TEMP_PREFIX, StoredObject, get_storage
+
+GC_BATCH_SIZE = 500
+STALE_UPLOAD_SECONDS = 24 * 3600
+
+SESSION_KEY_PATTERN = re.compile(r'^(?:session|violation)_(\d+)_')
+RECORDING_KEY_PATTERN = re.compile(r'^session_(\d+)_recording\.webm$')
+RENDITION_KEY_PATTERN = re.compile(r'^session_(\d+)_(?:review|contact)\.')
+REASONS = ('orphaned', 'expired', 'quota')
+
+
+def collect_media(dry_run=False, batch_size=GC_BATCH_SIZE, now=None):
+    """Run one GC pass and return a report of what was (or would be) reclaimed"""
+    config = current_app.config
+    default_retention = config['MEDIA_RETENTION_DAYS']
+    quota = config['MEDIA_QUOTA_BYTES']
+    storage = get_storage()
+    now = now or datetime.utcnow()
+
+    report = {'dry_run': dry_run, 'scanned_files': 0, 'scanned_bytes': 0}
+    report.update({reason: {'files': 0, 'bytes': 0} for reason in REASONS})
+    survivors = []  # (modified_at, size, key) of objects that may count against the quota
+    retained_bytes = 0
+
+    for batch in storage.iter_objects(batch_size):
+        report['scanned_files'] += len(batch)
+        report['scanned_bytes'] += sum(obj.size for obj in batch)
+
+        session_ids = {_session_id(obj.key) for obj in batch} - {None}
+        sessions = {}
+        if session_ids:
+            sessions = {row.id: row for row in db.session.execute(
+                select(ExamSession.id, ExamSession.started_at, ExamSession.submitted_at,
+                       Exam.media_retention_days)
+                .join(Exam, Exam.id == ExamSession.exam_id)
+                .where(ExamSession.id.in_(session_ids))
+            )}
+
+        doomed = {reason: [] for reason in REASONS}
+        for obj in batch:
+            if obj.key.startswith(TEMP_PREFIX):
+                if time.time() - obj.modified_at > STALE_UPLOAD_SECONDS:
+                    doomed['orphaned'].append(obj)
+                continue
+            session_id = _session_id(obj.key)
+            if session_id is None:
+                retained_bytes += obj.size
+                continue
+            session = sessions.get(session_id)
+            if session is None:
+                doomed['orphaned'].append(obj)
+                continue
+            days = session.media_retention_days if session.media_retention_days is not None else default_retention
+            ended_at = session.submitted_at or session.started_at
+            if days and ended_at and ended_at < now - timedelta(days=days):
+                doomed['expired'].append(obj)
+                continue
+            survivors.append((obj.modified_at, obj.size, obj.key))
+            retained_bytes += obj.size
+
+        for reason, objects in doomed.items():
+            _remove(storage, objects, reason, report, dry_run)
+
+    if quota and retained_bytes > quota:
+        survivors.sort()
+        evicted = []
+        for modified_at, size, key in survivors:
+            if retained_bytes <= quota:
+                break
+            evicted.append(StoredObject(key, size, modified_at))
+            retained_bytes -= size
+        for start in range(0, len(evicted), batch_size):
+            _remove(storage, evicted[start:start + batch_size], 'quota', report, dry_run)
+
+    report['reclaimed_bytes'] = sum(report[reason]['bytes'] for reason in REASONS)
+    report['remaining_bytes'] = retained_bytes
+    return report
+
+
+def start_media_gc(app, dry_run=False):
+    """Run a GC pass on a background thread and log its report"""
+    def run():
+        with app.app_context():
+            try:
+                report = collect_media(dry_run=dry_run)
+                print(f"Media GC finished: {report}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error collecting media: {str(e)}")
+
+    thread = threading.Thread(target=run, name='media-gc', daemon=True)
+    thread.start()
+    return thread
+
+
+def _session_id(key):
+    match = SESSION_KEY_PATTERN.match(key)
+    return int(match.group(1)) if match else None
+
+
+def _remove(storage, objects, reason, report, dry_run):
+    if not objects:
+        return
+    removed = []
+    for obj in objects:
+        if not dry_run:
+            try:
+                storage.delete(obj.key)
+            except Exception as e:
+                print(f"Error deleting media {obj.key}: {str(e)}")
+                continue
+        removed.append(obj.key)
+        report[reason]['files'] += 1
+        report[reason]['bytes'] += obj.size
+
+    if dry_run or not removed or reason == 'orphaned':
+        return
+
+    recording_sessions = [int(m.group(1)) for m in map(RECORDING_KEY_PATTERN.match, removed) if m]
+    if recording_sessions:
+        db.session.execute(
+            update(ExamSession).where(ExamSession.id.in_(recording_sessions)).values(video_recording_path=None),
+            execution_options={'synchronize_session': False}
+        )
+    rendition_sessions = [int(m.group(1)) for m in map(RENDITION_KEY_PATTERN.match, removed) if m]
+    if rendition_sessions:
+        db.session.execute(
+            update(ExamSession).where(ExamSession.id.in_(rendition_sessions)).values(media_renditions=None),
+            execution_options={'synchronize_session': False}
+        )
+    screenshot_paths = removed + ['recordings/' + key for key in removed]
+    db.session.execute(
+        update(ProctoringViolation)
+        .where(ProctoringViolation.screenshot_path.in_(screenshot_paths))
+        .values(screenshot_path=None),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
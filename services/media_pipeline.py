@@ -0,0 +1,231 @@
+"""
+Review renditions for session recordings.
+
+After a recording is uploaded it is handed to a small process pool (video
+decoding is CPU-bound and would stall a request worker). The pool produces:
+
+- a review rendition: at most MEDIA_REVIEW_MAX_WIDTH pixels wide and
+  MEDIA_REVIEW_FPS frames per second, VP8 WebM so browsers can play it
+- a contact sheet: one thumbnail every MEDIA_CONTACT_SHEET_INTERVAL seconds,
+  tiled into a single JPEG with timestamps
+
+Both are stored next to the original and their sizes are recorded in
+ExamSession.media_renditions. At most MEDIA_PROCESS_QUEUE recordings wait for
+the pool; beyond that uploads are not queued and `flask process-recordings`
+picks them up later.
+"""
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+REVIEW_FOURCC = 'VP80'
+THUMBNAIL_WIDTH = 240
+CONTACT_SHEET_COLUMNS = 6
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def review_key(session_id):
+    return f"session_{session_id}_review.webm"
+
+
+def contact_sheet_key(session_id):
+    return f"session_{session_id}_contact.jpg"
+
+
+def pipeline_options(config):
+    return {
+        'max_width': config['MEDIA_REVIEW_MAX_WIDTH'],
+        'fps': config['MEDIA_REVIEW_FPS'],
+        'interval': config['MEDIA_CONTACT_SHEET_INTERVAL']
+    }
+
+
+def process_recording(storage_config, session_id, key, options):
+    """
+    Build the review rendition and contact sheet for one recording. Runs in a
+    pool process, so it only takes picklable arguments and never touches the DB.
+    """
+    from services.storage import create_storage
+    storage = create_storage(storage_config)
+
+    with storage.local_copy(key) as source, tempfile.TemporaryDirectory() as workdir:
+        review_path = os.path.join(workdir, 'review.webm')
+        sheet_path = os.path.join(workdir, 'contact.jpg')
+        info = _transcode(source, review_path, sheet_path, options)
+
+        renditions = {
+            'original_bytes': os.path.getsize(source),
+            'duration_seconds': round(info['duration'], 1),
+            'processed_at': datetime.utcnow().isoformat()
+        }
+        if info['frames_written']:
+            with open(review_path, 'rb') as f:
+                size = storage.save(review_key(session_id), f, 'video/webm')
+            renditions['review'] = {'key': review_key(session_id), 'bytes': size,
+                                    'width': info['width'], 'height': info['height'], 'fps': options['fps']}
+        if info['thumbnails']:
+            with open(sheet_path, 'rb') as f:
+                size = storage.save(contact_sheet_key(session_id), f, 'image/jpeg')
+            renditions['contact_sheet'] = {'key': contact_sheet_key(session_id), 'bytes': size,
+                                           'thumbnails': info['thumbnails'],
+                                           'interval_seconds': options['interval']}
+    return renditions
+
+
+def _transcode(source, review_path, sheet_path, options):
+    import cv2
+    from PIL import Image, ImageDraw
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot decode recording {source}")
+
+    writer = None
+    width = height = 0
+    frames_written = 0
+    thumbnails = []
+    next_frame_ms = 0.0
+    next_thumb_ms = 0.0
+    frame_ms = 1000.0 / options['fps']
+    thumb_ms = options['interval'] * 1000.0
+    last_ms = 0.0
+
+    try:
+        # MediaRecorder WebM often has no usable frame count or FPS, so walk
+        # the stream and use each frame's timestamp. grab() skips decoding
+        # work for frames that are dropped.
+        while capture.grab():
+            position_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+            last_ms = max(last_ms, position_ms)
+            want_frame = position_ms >= next_frame_ms
+            want_thumb = position_ms >= next_thumb_ms
+            if not (want_frame or want_thumb):
+                continue
+            ok, frame = capture.retrieve()
+            if not ok:
+                continue
+
+            if writer is None:
+                source_height, source_width = frame.shape[:2]
+                scale = min(1.0, options['max_width'] / source_width)
+                width = int(source_width * scale) // 2 * 2
+                height = int(source_height * scale) // 2 * 2
+                writer = cv2.VideoWriter(review_path, cv2.VideoWriter_fourcc(*REVIEW_FOURCC),
+                                         options['fps'], (width, height))
+
+            if want_frame:
+                writer.write(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+                frames_written += 1
+                next_frame_ms = (math.floor(position_ms / frame_ms) + 1) * frame_ms
+            if want_thumb:
+                thumb_height = int(frame.shape[0] * THUMBNAIL_WIDTH / frame.shape[1])
+                thumb = cv2.resize(frame, (THUMBNAIL_WIDTH, thumb_height), interpolation=cv2.INTER_AREA)
+                thumbnails.append((position_ms, Image.fromarray(cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB))))
+                next_thumb_ms = (math.floor(position_ms / thumb_ms) + 1) * thumb_ms
+    finally:
+        capture.release()
+        if writer is not None:
+            writer.release()
+
+    if thumbnails:
+        thumb_height = max(image.height for _, image in thumbnails)
+        columns = min(CONTACT_SHEET_COLUMNS, len(thumbnails))
+        rows = math.ceil(len(thumbnails) / columns)
+        sheet = Image.new('RGB', (columns * THUMBNAIL_WIDTH, rows * thumb_height), 'black')
+        draw = ImageDraw.Draw(sheet)
+        for i, (position_ms, image) in enumerate(thumbnails):
+            x, y = (i % columns) * THUMBNAIL_WIDTH, (i // columns) * thumb_height
+            sheet.paste(image, (x, y))
+            seconds = int(position_ms // 1000)
+            label = f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+            draw.rectangle([x, y, x + 56, y + 14], fill='black')
+            draw.text((x + 3, y + 2), label, fill='white')
+        sheet.save(sheet_path, 'JPEG', quality=80)
+
+    return {'width': width, 'height': height, 'frames_written': frames_written,
+            'thumbnails': len(thumbnails), 'duration': last_ms / 1000}
+
+
+def submit_recording(app, session_id, key):
+    """Queue a recording for processing; returns False when the queue is full"""
+    executor, slots = _get_executor(app)
+    if not slots.acquire(blocking=False):
+        print(f"Media pipeline busy, skipping recording {key}")
+        return False
+
+    from services.storage import storage_config
+    future = executor.submit(process_recording, storage_config(app.config), session_id, key,
+                             pipeline_options(app.config))
+
+    def finished(future):
+        slots.release()
+        try:
+            renditions = future.result()
+        except Exception as e:
+            print(f"Error processing recording {key}: {str(e)}")
+            return
+        with app.app_context():
+            save_renditions(session_id, renditions)
+
+    future.add_done_callback(finished)
+    return True
+
+
+def process_pending_recordings(app, session_id=None, force=False):
+    """Process recordings without renditions (for `flask process-recordings`); returns (done, failed)"""
+    from sqlalchemy import select
+    from models import db, ExamSession
+    from services.storage import key_from_path, storage_config
+
+    query = select(ExamSession.id, ExamSession.video_recording_path).where(
+        ExamSession.video_recording_path.isnot(None))
+    if session_id:
+        query = query.where(ExamSession.id == session_id)
+    elif not force:
+        query = query.where(ExamSession.media_renditions.is_(None))
+    pending = db.session.execute(query).all()
+
+    done = failed = 0
+    config, options = storage_config(app.config), pipeline_options(app.config)
+    with ProcessPoolExecutor(max_workers=max(1, app.config['MEDIA_PROCESS_WORKERS']),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(process_recording, config, sid, key_from_path(path), options): sid
+                   for sid, path in pending}
+        for future in as_completed(futures):
+            try:
+                save_renditions(futures[future], future.result())
+                done += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error processing recording for session {futures[future]}: {str(e)}")
+                failed += 1
+    return done, failed
+
+
+def save_renditions(session_id, renditions):
+    from sqlalchemy import update
+    from models import db, ExamSession
+    db.session.execute(
+        update(ExamSession).where(ExamSession.id == session_id).values(media_renditions=renditions),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def _get_executor(app):
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: forking a threaded gunicorn worker with open DB connections is unsafe
+                _executor = ProcessPoolExecutor(max_workers=app.config['MEDIA_PROCESS_WORKERS'],
+                                                mp_context=multiprocessing.get_context('spawn'))
+                _slots = threading.BoundedSemaphore(app.config['MEDIA_PROCESS_QUEUE'])
+    return _executor, _slots
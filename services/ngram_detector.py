@@ -0,0 +1,345 @@
+"""
+Offline n-gram language-model detector.
+
+`flask train-ngram-model` counts character n-grams (CHAR_ORDER) and word
+n-grams (WORD_ORDER) over human-written answers into fixed-size hashed count
+tables. One answer in HOLDOUT_EVERY is held out instead, to learn how human
+answers score. The tables and those statistics are written to one file
+(NGRAM_MODEL_PATH), which every worker memory-maps at startup, so the pages
+are shared and loading costs nothing.
+
+An answer is scored on three signals, each compared with the held-out human
+answers:
+
+- word perplexity: vocabulary and phrasing unusual for our candidates
+- character perplexity: spelling and word forms unusual for them, which
+  also covers words the word model has never seen
+- burstiness: how much perplexity varies between sentences. People write
+  unevenly; generated text is uniformly predictable.
+
+Scoring is vectorised numpy over the answer, with no network access.
+"""
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import zlib
+
+MAGIC = b'NGRAMLM1'
+CHAR_ORDER = 5
+WORD_ORDER = 3
+CHAR_BUCKETS = 1 << 20
+WORD_BUCKETS = 1 << 21
+HASH_BASE = 1000003
+HOLDOUT_EVERY = 10
+MAX_HOLDOUT = 2000
+MIN_SENTENCE_WORDS = 3
+PAD_CHAR = 2
+PAD_WORD = zlib.crc32(b'<s>')
+
+# Each signal is how far (in human standard deviations, clipped to
+# MAX_SIGNAL) an answer leans toward AI; the weights say how much it counts.
+# Tune these against labelled answers.
+SIGNAL_WEIGHTS = {'word_perplexity': 0.35, 'char_perplexity': 0.25, 'burstiness': 0.4}
+MAX_SIGNAL = 3.0
+DECISION_SCORE = 1.0  # weighted z-score at which confidence reaches 0.5
+CONFIDENCE_SLOPE = 1.6
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+|[.!?]+")
+_SPACE_PATTERN = re.compile(r'\s+')
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _mix(hashes):
+    import numpy as np
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * np.uint64(0xff51afd7ed558ccd)
+    return hashes ^ (hashes >> np.uint64(33))
+
+
+def _gram_hashes(ids, order):
+    """Mixed hashes of every n-gram, n = 1..order: result[n - 1][j] covers ids[j:j + n]"""
+    import numpy as np
+    grams = []
+    rolling = np.zeros(len(ids), dtype=np.uint64)
+    for n in range(1, order + 1):
+        rolling = rolling[:len(ids) - n + 1] * np.uint64(HASH_BASE) + ids[n - 1:]
+        grams.append(_mix(rolling))
+    return grams
+
+
+def _char_ids(text):
+    import numpy as np
+    normalized = _SPACE_PATTERN.sub(' ', text.lower()).strip()
+    codes = np.frombuffer(normalized.encode('utf-32-le'), dtype='<u4').astype(np.uint64)
+    return np.concatenate([np.full(CHAR_ORDER - 1, PAD_CHAR, dtype=np.uint64), codes])
+
+
+def _word_tokens(text):
+    import numpy as np
+    tokens = _WORD_PATTERN.findall(text.lower())
+    ids = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    ends = np.fromiter((token[0] in '.!?' for token in tokens), dtype=bool, count=len(tokens))
+    return np.concatenate([np.full(WORD_ORDER - 1, PAD_WORD, dtype=np.uint64), ids]), ends
+
+
+def _bucket_indexes(ids, order, buckets):
+    import numpy as np
+    mask = np.uint64(buckets - 1)
+    return [(grams & mask).astype(np.intp) for grams in _gram_hashes(ids, order)]
+
+
+class NgramModel:
+    """Hashed count tables mapped read-only from a trained model file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an n-gram model file")
+        header_size = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 4], 'little')
+        start = len(MAGIC) + 4
+        self.header = json.loads(self._mmap[start:start + header_size])
+        self.path = path
+        self._tables = None
+        self._tables_lock = threading.Lock()
+
+    @property
+    def tables(self):
+        # numpy views are created on first use so worker boot stays light
+        if self._tables is None:
+            with self._tables_lock:
+                if self._tables is None:
+                    import numpy as np
+                    self._tables = {
+                        name: np.frombuffer(self._mmap, dtype='<u4', count=spec['length'], offset=spec['offset'])
+                        for name, spec in self.header['tables'].items()
+                    }
+        return self._tables
+
+    def _surprisal(self, ids, kind, order, buckets):
+        """Bits of surprisal of every real token (after the padding) under one model"""
+        import numpy as np
+        indexes = _bucket_indexes(ids, order, buckets)
+        tables = [self.tables[f'{kind}{n}'] for n in range(1, order + 1)]
+        first = order - 1  # index of the first real token
+        length = len(ids) - first
+
+        unigram = tables[0][indexes[0][first:]].astype(np.float64)
+        probability = (unigram + 1) / (self.header[f'{kind}_total'] + self.header[f'{kind}_vocabulary'])
+        weights = np.arange(1, order + 1, dtype=np.float64)
+        weights /= weights.sum()
+        probability *= weights[0]
+        for n in range(2, order + 1):
+            # The n-gram ending at each real token, and its (n - 1)-gram context
+            starts = slice(first - n + 1, first - n + 1 + length)
+            counts = tables[n - 1][indexes[n - 1][starts]].astype(np.float64)
+            contexts = tables[n - 2][indexes[n - 2][starts]].astype(np.float64)
+            ratio = np.divide(counts, contexts, out=np.zeros(length), where=contexts > 0)
+            probability += weights[n - 1] * np.minimum(ratio, 1.0)
+        return -np.log2(probability)
+
+    def features(self, text):
+        """Mean word and character surprisal (bits) and sentence-level burstiness"""
+        import numpy as np
+        char_ids = _char_ids(text)
+        word_ids, ends = _word_tokens(text)
+        if len(char_ids) < CHAR_ORDER or not len(ends):
+            return None
+        char_bits = self._surprisal(char_ids, 'char', CHAR_ORDER, self.header['char_buckets'])
+        word_bits = self._surprisal(word_ids, 'word', WORD_ORDER, self.header['word_buckets'])
+
+        # Sentence index of each token; a terminator belongs to its sentence
+        sentence = np.concatenate(([0], np.cumsum(ends)[:-1]))
+        is_word = ~ends
+        sizes = np.bincount(sentence[is_word], minlength=sentence[-1] + 1)
+        sums = np.bincount(sentence[is_word], weights=word_bits[is_word], minlength=sentence[-1] + 1)
+        means = sums[sizes >= MIN_SENTENCE_WORDS] / sizes[sizes >= MIN_SENTENCE_WORDS]
+        burstiness = float(means.std() / means.mean()) if len(means) >= 2 and means.mean() > 0 else None
+
+        return {
+            'word_perplexity': float(2 ** word_bits.mean()),
+            'char_perplexity': float(2 ** char_bits.mean()),
+            'burstiness': burstiness,
+            'word_bits': float(word_bits.mean()),
+            'char_bits': float(char_bits.mean())
+        }
+
+    def detect(self, text):
+        """Score one answer; returns the same dict as detect_ai_content"""
+        features = self.features(text)
+        if features is None:
+            return {'is_ai_generated': False, 'confidence': 0.0, 'analysis': 'Text too short to analyze'}
+        human = self.header['calibration']
+
+        # Positive = leaning AI: less typical wording, more uniform sentences
+        signals = {
+            'word_perplexity': _z(features['word_bits'], human['word_bits']),
+            'char_perplexity': _z(features['char_bits'], human['char_bits']),
+            'burstiness': (-_z(features['burstiness'], human['burstiness'])
+                           if features['burstiness'] is not None else 0.0)
+        }
+        score = sum(SIGNAL_WEIGHTS[name] * max(-MAX_SIGNAL, min(MAX_SIGNAL, value))
+                    for name, value in signals.items())
+        confidence = 1 / (1 + math.exp(-CONFIDENCE_SLOPE * (score - DECISION_SCORE)))
+        is_ai_generated = confidence > 0.5
+
+        reasons = [
+            f"word perplexity {features['word_perplexity']:.0f} (human {2 ** human['word_bits']['mean']:.0f})",
+            f"character perplexity {features['char_perplexity']:.1f} (human {2 ** human['char_bits']['mean']:.1f})"
+        ]
+        if features['burstiness'] is not None:
+            reasons.append(f"burstiness {features['burstiness']:.2f} (human {human['burstiness']['mean']:.2f})")
+        if is_ai_generated:
+            analysis = f"LIKELY AI/PLAGIARISM (N-gram model): {'; '.join(reasons)}"
+        else:
+            analysis = f"Appears human-written (N-gram model): {'; '.join(reasons)}"
+
+        return {
+            'is_ai_generated': is_ai_generated,
+            'confidence': round(confidence, 2),
+            'analysis': analysis
+        }
+
+
+def _z(value, stats):
+    return (value - stats['mean']) / stats['std'] if stats['std'] > 0 else 0.0
+
+
+def train(texts, path, char_buckets=CHAR_BUCKETS, word_buckets=WORD_BUCKETS, batch_size=500):
+    """Count n-grams over an iterable of human answers and write a model file; returns its header"""
+    import numpy as np
+    counts = {f'char{n}': np.zeros(char_buckets, dtype=np.int64) for n in range(1, CHAR_ORDER + 1)}
+    counts.update({f'word{n}': np.zeros(word_buckets, dtype=np.int64) for n in range(1, WORD_ORDER + 1)})
+    totals = {'char': 0, 'word': 0}
+    holdout, batch, trained = [], [], 0
+
+    def flush(batch):
+        pending = {name: [] for name in counts}
+        for text in batch:
+            char_ids = _char_ids(text)
+            word_ids, _ = _word_tokens(text)
+            totals['char'] += len(char_ids) - (CHAR_ORDER - 1)
+            totals['word'] += len(word_ids) - (WORD_ORDER - 1)
+            for n, index in enumerate(_bucket_indexes(char_ids, CHAR_ORDER, char_buckets), 1):
+                pending[f'char{n}'].append(index)
+            for n, index in enumerate(_bucket_indexes(word_ids, WORD_ORDER, word_buckets), 1):
+                pending[f'word{n}'].append(index)
+        for name, indexes in pending.items():
+            if indexes:
+                counts[name] += np.bincount(np.concatenate(indexes), minlength=len(counts[name]))
+
+    for i, text in enumerate(texts):
+        if not text or len(text.strip()) < 50:
+            continue
+        if i % HOLDOUT_EVERY == HOLDOUT_EVERY - 1 and len(holdout) < MAX_HOLDOUT:
+            holdout.append(text)
+            continue
+        batch.append(text)
+        trained += 1
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    flush(batch)
+    if not trained or not holdout:
+        raise ValueError(f"Need at least {HOLDOUT_EVERY} human answers of 50+ characters to train")
+
+    header = {
+        'char_order': CHAR_ORDER, 'word_order': WORD_ORDER,
+        'char_buckets': char_buckets, 'word_buckets': word_buckets,
+        'char_total': totals['char'], 'word_total': totals['word'],
+        'char_vocabulary': int(np.count_nonzero(counts['char1'])),
+        'word_vocabulary': int(np.count_nonzero(counts['word1'])),
+        'trained_answers': trained, 'holdout_answers': len(holdout),
+        'tables': {}, 'calibration': {}
+    }
+    _write(path, header, counts)
+
+    # Score the held-out human answers to learn what human looks like
+    model = NgramModel(path)
+    samples = [f for f in map(model.features, holdout) if f]
+    for name in ('word_bits', 'char_bits', 'burstiness'):
+        values = np.array([f[name] for f in samples if f[name] is not None], dtype=np.float64)
+        header['calibration'][name] = {'mean': float(values.mean()) if len(values) else 0.0,
+                                       'std': float(values.std()) if len(values) else 0.0}
+    _write(path, header, counts)
+    return header
+
+
+def _write(path, header, counts):
+    """Header JSON, then each table as little-endian uint32 at a 64-byte aligned offset"""
+    import numpy as np
+    names = sorted(counts)
+    header_bytes = b''
+    # Offsets depend on the header size, so settle them iteratively
+    for _ in range(3):
+        offset = len(MAGIC) + 4 + len(header_bytes)
+        for name in names:
+            offset = (offset + 63) // 64 * 64
+            header['tables'][name] = {'offset': offset, 'length': len(counts[name])}
+            offset += len(counts[name]) * 4
+        header_bytes = json.dumps(header).encode()
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC + len(header_bytes).to_bytes(4, 'little') + header_bytes)
+        for name in names:
+            f.write(b'\0' * (header['tables'][name]['offset'] - f.tell()))
+            f.write(np.minimum(counts[name], 0xFFFFFFFF).astype('<u4').tobytes())
+    os.replace(tmp_path, path)
+
+
+def human_answer_texts(batch_size=1000):
+    """Stream open-ended answers from submitted sessions not flagged as AI-generated"""
+    from sqlalchemy import select
+    from models import db, Answer, ExamSession, Question
+    result = db.session.execute(
+        select(Answer.answer_text)
+        .join(ExamSession, ExamSession.id == Answer.session_id)
+        .join(Question, Question.id == Answer.question_id)
+        .where(Question.question_type == 'open_ended', Answer.answer_text.isnot(None),
+               ExamSession.status != 'in_progress', Answer.is_ai_generated.isnot(True))
+        .order_by(Answer.id),
+        execution_options={'yield_per': batch_size}
+    )
+    for text in result.scalars():
+        yield text
+
+
+def read_texts(path):
+    """Answers from a file: JSONL objects with a "text" field, or one answer per line"""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('{'):
+                line = json.loads(line).get('text') or ''
+            if line:
+                yield line
+
+
+def load_model(path):
+    """Map a model file for this process, replacing any loaded model; None if it is missing"""
+    global _model
+    model = NgramModel(path) if path and os.path.exists(path) else None
+    with _model_lock:
+        _model = model
+    return model
+
+
+def get_model():
+    return _model
+
+
+def init_app(app):
+    app.config.setdefault('NGRAM_MODEL_PATH', 'ngram_model.bin')
+    try:
+        model = load_model(app.config['NGRAM_MODEL_PATH'])
+    except (OSError, ValueError) as e:
+        print(f"Error loading n-gram model, using pattern detection: {str(e)}")
+        return
+    if model is not None:
+        print(f"Loaded n-gram model {model.path} ({model.header['trained_answers']} answers)")
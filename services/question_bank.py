@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+
+QUESTION_TYPES = ('mcq', 'open_ended')
+MCQ_LETTERS = 'ABCDEFGH'
+
+
+# MCQ options may be given in CSV either as option_a..option_h columns or as a
+# single "options" column holding a JSON list or a "|"-separated string.
+def parse_csv_questions(stream):
+    """Read a CSV question bank into a list of dicts"""
+    if isinstance(stream, bytes):
+        stream = stream.decode('utf-8-sig')
+    if isinstance(stream, str):
+        stream = io.StringIO(stream)
+
+    items = []
+    for row in csv.DictReader(stream):
+        item = {k.strip().lower(): (v.strip() if isinstance(v, str) else v)
+                for k, v in row.items() if k}
+
+        options = item.pop('options', None)
+        lettered = [item.pop(f'option_{letter.lower()}', None) for letter in MCQ_LETTERS]
+        if options:
+            if options.startswith('['):
+                try:
+                    options = json.loads(options)
+                except ValueError:
+                    pass
+            else:
+                options = [o.strip() for o in options.split('|')]
+        elif any(lettered):
+            options = [o for o in lettered if o]
+        item['options'] = options or None
+
+        items.append({k: v for k, v in item.items() if v not in ('', None) or k == 'options'})
+    return items
+
+
+def _to_int(value, field, errors):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors.append(f'{field} must be an integer')
+        return None
+
+
+def validate_questions(items, exam_id, start_order=1):
+    """
+    Validate a question bank in one pass.
+    Returns (rows, errors) where rows are ready for a bulk insert into
+    `questions` and errors is a list of {'row': index, 'errors': [...]}.
+    """
+    rows = []
+    errors = []
+
+    for index, item in enumerate(items):
+        row_errors = []
+        if not isinstance(item, dict):
+            errors.append({'row': index, 'errors': ['Question must be an object']})
+            continue
+
+        question_type = item.get('question_type')
+        question_text = item.get('question_text')
+
+        if question_type not in QUESTION_TYPES:
+            row_errors.append(f"question_type must be one of {', '.join(QUESTION_TYPES)}")
+        if not question_text or not str(question_text).strip():
+            row_errors.append('question_text is required')
+
+        points = _to_int(item.get('points'), 'points', row_errors)
+        order = _to_int(item.get('order'), 'order', row_errors)
+
+        row = {
+            'exam_id': exam_id,
+            'question_type': question_type,
+            'question_text': question_text,
+            'points': points if points is not None else 1,
+            'order': order if order is not None else start_order + index,
+            'options': None,
+            'correct_answer': None,
+            'max_words': None,
+            'sample_answer': None
+        }
+
+        if question_type == 'mcq':
+            options = item.get('options')
+            correct_answer = str(item.get('correct_answer') or '').strip().upper()
+            if not isinstance(options, list) or len(options) < 2:
+                row_errors.append('options must be a list of at least 2 choices')
+            elif len(options) > len(MCQ_LETTERS):
+                row_errors.append(f'options may not have more than {len(MCQ_LETTERS)} choices')
+            elif correct_answer not in set(MCQ_LETTERS[:len(options)]):
+                row_errors.append(f'correct_answer must be one of {MCQ_LETTERS[:len(options)]}')
+            row['options'] = options
+            row['correct_answer'] = correct_answer
+        elif question_type == 'open_ended':
+            row['max_words'] = _to_int(item.get('max_words'), 'max_words', row_errors)
+            row['sample_answer'] = item.get('sample_answer')
+
+        if row_errors:
+            errors.append({'row': index, 'errors': row_errors})
+        else:
+            rows.append(row)
+
+    return rows, errors
@@ -0,0 +1,70 @@
+"""
+Fast JSON responses for large result sets.
+
+A Schema maps response keys to SQL columns (or nested dicts of them). It is
+turned once into a function that builds the response dict straight from a
+result row tuple, so routes select just those columns and skip ORM object
+hydration and per-field conversions. json_response encodes with orjson,
+which writes datetimes as ISO 8601 itself, and falls back to the stdlib
+encoder when orjson is not installed.
+"""
+import json
+from datetime import date, datetime
+from operator import itemgetter
+from flask import Response
+from sqlalchemy import select
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is always available
+    orjson = None
+
+
+class Schema:
+    """Ordered response fields: {key: column, or a dict for a nested object}"""
+
+    def __init__(self, fields):
+        self.columns = []
+        self.row = self._builder(fields)
+
+    def _builder(self, fields):
+        """Function building one (nested) dict from a row, by column position"""
+        items = []
+        for key, value in fields.items():
+            if isinstance(value, dict):
+                items.append((key, self._builder(value)))
+            else:
+                items.append((key, len(self.columns)))
+                self.columns.append(value)
+        if all(isinstance(item, int) for _, item in items):
+            # Flat schemas (the common case) read every field with one itemgetter call
+            keys = [key for key, _ in items]
+            values = itemgetter(*[index for _, index in items])
+            if len(items) == 1:
+                return lambda row: {keys[0]: values(row)}
+            return lambda row: dict(zip(keys, values(row)))
+        keys = [key for key, _ in items]
+        getters = [item if callable(item) else itemgetter(item) for _, item in items]
+        return lambda row: dict(zip(keys, [get(row) for get in getters]))
+
+    def select(self):
+        return select(*self.columns)
+
+    def many(self, rows):
+        return list(map(self.row, rows))
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200):
+    return Response(dumps(payload), status=status, mimetype='application/json')
@@ -0,0 +1,265 @@
+"""
+Blob storage for proctoring media (session recordings, violation screenshots).
+
+STORAGE_BACKEND selects the backend:
+
+- 'local' (default): files under RECORDING_FOLDER, served by /recordings/<key>.
+  Only suitable for a single host.
+- 's3': any S3-compatible store (AWS S3, MinIO, R2). Uploads through Flask are
+  streamed with boto3's managed multipart transfer. Browsers can also PUT
+  straight to a presigned URL, and /recordings/<key> redirects to a presigned
+  GET, so media bytes never pass through a worker.
+
+Objects are addressed by flat keys such as 'session_12_recording.webm'. Those
+keys are what sessions and violations store.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from flask import abort, current_app, redirect, send_from_directory, url_for
+
+COPY_CHUNK_SIZE = 1024 * 1024
+TEMP_PREFIX = '.upload-'
+
+StoredObject = namedtuple('StoredObject', ['key', 'size', 'modified_at'])
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+class LocalStorage:
+    """Stores objects as files in one directory"""
+
+    name = 'local'
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.dirname(path) != self.root:
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def save(self, key, stream, content_type=None):
+        """Stream a file object to disk and return the number of bytes written"""
+        path = self.path(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f, COPY_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return os.path.getsize(path)
+
+    def size(self, key):
+        """Object size in bytes, or None if it does not exist"""
+        try:
+            return os.path.getsize(self.path(key))
+        except OSError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def iter_objects(self, batch_size=500):
+        """Yield lists of StoredObject, reading the directory incrementally"""
+        batch = []
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                batch.append(StoredObject(entry.name, stat.st_size, stat.st_mtime))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    @contextmanager
+    def local_copy(self, key):
+        """Yield a filesystem path holding the object's bytes"""
+        yield self.path(key)
+
+    def upload_url(self, key, content_type, expires):
+        """Direct uploads are not possible; clients POST through Flask instead"""
+        return None
+
+    def download_url(self, key, expires):
+        return url_for('serve_recording', filename=key)
+
+    def send(self, key):
+        return send_from_directory(self.root, key)
+
+
+class S3Storage:
+    """Stores objects in an S3-compatible bucket (boto3 is imported on first use)"""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 access_key_id=None, secret_access_key=None,
+                 multipart_threshold=8 * 1024 * 1024, multipart_chunksize=8 * 1024 * 1024):
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self._client_kwargs = {
+            'endpoint_url': endpoint_url or None,
+            'region_name': region or None,
+            'aws_access_key_id': access_key_id or None,
+            'aws_secret_access_key': secret_access_key or None
+        }
+        self._transfer = {'multipart_threshold': multipart_threshold,
+                          'multipart_chunksize': multipart_chunksize}
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client('s3', **self._client_kwargs)
+        return self._client
+
+    def object_key(self, key):
+        if '/' in key or key in ('', '.', '..'):
+            raise ValueError(f"Invalid storage key: {key}")
+        return self.prefix + key
+
+    def save(self, key, stream, content_type=None):
+        """Stream a file object to the bucket (multipart above the threshold)"""
+        from boto3.s3.transfer import TransferConfig
+        counted = _CountingReader(stream)
+        extra = {'ContentType': content_type} if content_type else None
+        self.client.upload_fileobj(counted, self.bucket, self.object_key(key), ExtraArgs=extra,
+                                   Config=TransferConfig(**self._transfer))
+        return counted.bytes_read
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return head['ContentLength']
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def iter_objects(self, batch_size=500):
+        """Yield lists of StoredObject, one listing page at a time"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=self.bucket, Prefix=self.prefix,
+                                   PaginationConfig={'PageSize': batch_size})
+        for page in pages:
+            batch = []
+            for item in page.get('Contents', []):
+                key = item['Key'][len(self.prefix):]
+                if key and '/' not in key:
+                    batch.append(StoredObject(key, item['Size'], item['LastModified'].timestamp()))
+            if batch:
+                yield batch
+
+    @contextmanager
+    def local_copy(self, key):
+        fd, tmp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), tmp_path)
+            yield tmp_path
+        finally:
+            os.remove(tmp_path)
+
+    def upload_url(self, key, content_type, expires):
+        """Presigned PUT the browser can send the object body to"""
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': self.object_key(key), 'ContentType': content_type},
+            ExpiresIn=expires
+        )
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Type': content_type}}
+
+    def download_url(self, key, expires):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.object_key(key)}, ExpiresIn=expires
+        )
+
+    def send(self, key):
+        try:
+            url = self.download_url(key, current_app.config['STORAGE_URL_EXPIRES'])
+        except ValueError:
+            abort(404)
+        return redirect(url)
+
+
+class _CountingReader:
+    """File wrapper that counts the bytes boto3 reads from it"""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+STORAGE_CONFIG_KEYS = ('STORAGE_BACKEND', 'RECORDING_FOLDER', 'S3_BUCKET', 'S3_PREFIX', 'S3_ENDPOINT_URL',
+                       'S3_REGION', 'S3_ACCESS_KEY_ID', 'S3_SECRET_ACCESS_KEY')
+
+
+def storage_config(config):
+    """The settings create_storage needs, as a plain dict for worker processes"""
+    return {name: config.get(name) for name in STORAGE_CONFIG_KEYS}
+
+
+def create_storage(config):
+    if config.get('STORAGE_BACKEND') == 's3':
+        return S3Storage(
+            config['S3_BUCKET'],
+            prefix=config.get('S3_PREFIX') or '',
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            region=config.get('S3_REGION'),
+            access_key_id=config.get('S3_ACCESS_KEY_ID'),
+            secret_access_key=config.get('S3_SECRET_ACCESS_KEY')
+        )
+    return LocalStorage(config['RECORDING_FOLDER'])
+
+
+def init_app(app):
+    global _storage
+    app.config.setdefault('STORAGE_URL_EXPIRES', 3600)
+    with _storage_lock:
+        _storage = create_storage(app.config)
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(current_app.config)
+    return _storage
+
+
+def key_from_path(path):
+    """Storage key for a stored path; rows written before keys kept full paths"""
+    return os.path.basename(path) if path else None
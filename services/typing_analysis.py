@@ -0,0 +1,102 @@
+"""
+Keystroke event logs for open-ended answers.
+
+The client sends batches of fixed-size little-endian records:
+    uint16 dt    milliseconds since the previous event (capped at 65535)
+    int16  size  characters inserted (negative for deletions)
+Four bytes per event keeps an hour of continuous typing well under 100KB.
+"""
+EVENT_SIZE = 4
+MAX_BATCH_BYTES = 64 * 1024
+
+# A single insert this large cannot be typed; it was pasted, dropped or injected
+PASTE_MIN_CHARS = 15
+# Sustained insert rate above this (chars/second over a 1s window) is not human typing
+BURST_CHARS_PER_SECOND = 25
+BURST_WINDOW_MS = 1000
+# Pauses longer than this are thinking time, not typing rhythm
+RHYTHM_MAX_GAP_MS = 2000
+
+
+def is_valid_batch(data):
+    return 0 < len(data) <= MAX_BATCH_BYTES and len(data) % EVENT_SIZE == 0
+
+
+def decode_events(batches):
+    """Concatenate stored batches into one structured array"""
+    import numpy as np
+    dtype = np.dtype([('dt', '<u2'), ('size', '<i2')])
+    if not batches:
+        return np.zeros(0, dtype=dtype)
+    return np.frombuffer(b''.join(batches), dtype=dtype)
+
+
+def analyze_events(events, max_bursts=20):
+    """Find paste bursts and unnatural typing rhythm in a decoded event log"""
+    import numpy as np
+    if len(events) == 0:
+        return {'total_events': 0, 'suspicious': False, 'reasons': []}
+
+    dt = events['dt'].astype(np.int64)
+    size = events['size'].astype(np.int64)
+    t = np.cumsum(dt)
+
+    inserted = np.where(size > 0, size, 0)
+    deleted = np.where(size < 0, -size, 0)
+
+    # Single large inserts
+    paste_mask = size >= PASTE_MIN_CHARS
+    pasted_chars = int(inserted[paste_mask].sum())
+
+    # Sliding-window insert rate: chars inserted in (t_i - window, t_i]
+    cum = np.concatenate(([0], np.cumsum(inserted)))
+    window_start = np.searchsorted(t, t - BURST_WINDOW_MS, side='right')
+    window_chars = cum[1:] - cum[window_start]
+    rate_mask = window_chars > BURST_CHARS_PER_SECOND * BURST_WINDOW_MS / 1000
+    burst_mask = paste_mask | rate_mask
+
+    # Collapse consecutive flagged events into bursts
+    bursts = []
+    if burst_mask.any():
+        flagged = np.flatnonzero(burst_mask)
+        splits = np.flatnonzero(np.diff(flagged) > 1) + 1
+        for group in np.split(flagged, splits):
+            chars = int(inserted[group[0]:group[-1] + 1].sum())
+            bursts.append({'at_ms': int(t[group[0]]), 'chars': chars})
+    burst_chars = sum(b['chars'] for b in bursts)
+
+    # Inter-key intervals of ordinary single-character typing
+    single = (size == 1) & (dt > 0) & (dt <= RHYTHM_MAX_GAP_MS)
+    intervals = dt[single]
+    rhythm = {}
+    if len(intervals) >= 20:
+        mean = float(intervals.mean())
+        std = float(intervals.std())
+        rhythm = {
+            'mean_interval_ms': round(mean, 1),
+            'interval_cv': round(std / mean, 3) if mean else 0.0,
+            'fast_key_ratio': round(float((intervals < 30).mean()), 3)
+        }
+
+    typed_chars = int(inserted.sum())
+    reasons = []
+    if typed_chars and burst_chars / typed_chars > 0.3:
+        reasons.append(f'{burst_chars} of {typed_chars} characters arrived in {len(bursts)} paste-like bursts')
+    if rhythm and rhythm['interval_cv'] < 0.25:
+        reasons.append(f"Unnaturally regular keystroke timing (CV {rhythm['interval_cv']})")
+    if rhythm and rhythm['fast_key_ratio'] > 0.5:
+        reasons.append('Most keystrokes faster than 30ms apart')
+
+    return {
+        'total_events': int(len(events)),
+        'duration_ms': int(t[-1]),
+        'typed_chars': typed_chars,
+        'deleted_chars': int(deleted.sum()),
+        'pasted_chars': pasted_chars,
+        'burst_count': len(bursts),
+        'burst_chars': burst_chars,
+        'bursts': sorted(bursts, key=lambda b: -b['chars'])[:max_bursts],
+        'rhythm': rhythm,
+        'suspicious': bool(reasons),
+        'reasons': reasons
+    }